@@ -1,17 +1,34 @@
 from market_sim.simulation import *
+from market_sim.jobs import JobManager, DONE, FAILED
+from market_sim.store import ResultStore
+from market_sim.downsample import downsample
 import dash
 import dash_html_components as html
 import dash_core_components as dcc
 import plotly.graph_objects as go
+import time
+import numpy as np
 import pandas as pd
 from dash.dependencies import Input, Output, State
-import pandas as pd
+from dash.exceptions import PreventUpdate
 
 # Initialise the app
 app = dash.Dash(__name__)
 server = app.server
 app.title = "StockMarketSimulator"
 
+# simulations run in worker processes, callbacks only submit and poll them
+jobs = JobManager(workers_=2)
+# results stay on the server as arrays, the page only holds the run id
+results = ResultStore()
+# the price chart is reduced to about this many points of the visible range
+MAX_POINTS = 2000
+DOWNSAMPLING = "lttb" # or "minmax"
+# the live chart keeps only the latest points
+LIVE_WINDOW = 5000
+# a running job redraws the (downsampled) price chart at most this often
+REDRAW_SECONDS = 2.0
+
 # Define the app
 app.layout = html.Div(
     children=[
@@ -77,6 +94,8 @@ app.layout = html.Div(
                                   html.H2(''),
                                   html.H2(''),
                                   html.Button('Simulate!', id='submit-val', n_clicks=0, style={'color': 'DarkOrange'}),
+                                  dcc.Checklist(id='live', options=[{'label': ' Live chart', 'value': 'live'}], value=[]),
+                                  html.P(id='progress'),
                                   html.H2(''),
                                   html.H2(''),
                                   html.A('Find the Source Code here', href='https://github.com/kgeoffrey'),
@@ -87,7 +106,7 @@ app.layout = html.Div(
                               children=[
                                   dcc.Graph(id='timeseries',
                                             config={'displayModeBar': False},
-                                            animate=True,
+                                            animate=False,
                                             style={'height': '50%'},
                                             ),
                                   dcc.Graph(id='bar',
@@ -97,8 +116,11 @@ app.layout = html.Div(
                                             )
                               ]
                               ),
-                     html.Div(id="data_timeseries", style={"display": "none"}),
-                     html.Div(id="data_bar", style={"display": "none"})
+                     dcc.Store(id="data_timeseries"),
+                     dcc.Store(id="data_bar"),
+                     dcc.Store(id="job_id"),
+                     dcc.Store(id="poll_state"),
+                     dcc.Interval(id="poll", interval=500, disabled=True)
                  ]
                  )
     ]
@@ -106,8 +128,7 @@ app.layout = html.Div(
 
 
 @app.callback(
-    [Output("data_timeseries", "children"),
-     Output("data_bar", "children")],
+    Output("job_id", "data"),
     [Input("submit-val", "n_clicks")],
     [State('length', 'value'),
      State('n_fund', 'value'),
@@ -116,41 +137,105 @@ app.layout = html.Div(
      State('f_dist_var', 'value'),
      State('c_dist_mean', 'value'),
      State('c_dist_var', 'value'),
+     State('job_id', 'data'),
      ]
 )
-def simulate_data(val, length, n_fund, n_chart, f_dist_mean, f_dist_var, c_dist_mean, c_dist_var):
-    sim = Simulation(length,
-                     n_fund,
-                     n_chart,
-                     (f_dist_mean, f_dist_var),
-                     (c_dist_mean, c_dist_var)
-                     )
-    sim.start()
-
-    sim.pnl_df["PNL"] = sim.pnl_df["PNL"] - 100 * f_dist_mean
-
-    return sim.market_prices_df.to_json(), sim.pnl_df.to_json()
+def simulate_data(val, length, n_fund, n_chart, f_dist_mean, f_dist_var, c_dist_mean, c_dist_var, job_id):
+    return jobs.submit((length,
+                        n_fund,
+                        n_chart,
+                        (f_dist_mean, f_dist_var),
+                        (c_dist_mean, c_dist_var)
+                        ),
+                       replaces_=job_id) # the previous run of the page is no longer shown
 
 
 @app.callback(
-    Output('timeseries', 'figure'),
-    [Input('data_timeseries', "children")],
+    [Output("data_timeseries", "data"),
+     Output("data_bar", "data"),
+     Output("progress", "children"),
+     Output("poll", "disabled"),
+     Output("timeseries", "extendData"),
+     Output("poll_state", "data")],
+    [Input("poll", "n_intervals"),
+     Input("job_id", "data")],
+    [State("live", "value"),
+     State("poll_state", "data")],
 )
-def update_graph(data):
-    data = list((pd.read_json(data))[0])
-    # print(data)
+def poll_job(n_intervals, job_id, live, poll_state):
+    job = jobs.get(job_id)
+    if job is None:
+        raise PreventUpdate
+
+    if job.status == FAILED:
+        return dash.no_update, dash.no_update, "Simulation failed: " + job.error, True, dash.no_update, dash.no_update
+
+    # the first poll of a job only sets up its state, so that in live mode no points reach the figure before
+    # update_graph has cleared it
+    new_job = any(t["prop_id"] == "job_id.data" for t in dash.callback_context.triggered)
+    if new_job or not poll_state or poll_state["run"] != job_id:
+        return dash.no_update, dash.no_update, "Simulating...", False, dash.no_update, {"run": job_id, "drawn": 0}
+
+    # only the prices received since the last poll are moved into the store, the status is read first so that a
+    # finished job has delivered all of them
+    status = job.status
+    new_prices = job.take_prices()
+    stored = results.get(job_id, "prices")
+    start = len(stored) if stored is not None else 0
+    points = results.append(job_id, "prices", np.array(new_prices, dtype=float)) if new_prices else start
+
+    if status != DONE:
+        progress = "Simulating... {:.0%}".format(job.progress())
+        if live:
+            extend = dash.no_update
+            if new_prices:
+                first = max(start, points - LIVE_WINDOW)
+                extend = [dict(x=[list(range(first, points))], y=[new_prices[first - start:]]), [0], LIVE_WINDOW]
+            return dash.no_update, dash.no_update, progress, False, extend, dash.no_update
+        if new_prices and time.time() - poll_state["drawn"] >= REDRAW_SECONDS:
+            return ({"run": job_id, "points": points}, dash.no_update, progress, False, dash.no_update,
+                    {"run": job_id, "drawn": time.time()})
+        return dash.no_update, dash.no_update, progress, False, dash.no_update, dash.no_update
+
+    pnl = job.take_pnl()
+    if pnl is not None:
+        traders, values = pnl
+        f_dist_mean = job.args[3][0]
+        results.put(job_id, traders=np.array(traders, dtype=str), pnl=np.array(values, dtype=float) - 100 * f_dist_mean)
+    return {"run": job_id, "points": points}, {"run": job_id}, "", True, dash.no_update, dash.no_update
+
 
+def visible_range(relayout, n):
+    """
+    Positions of the series inside the zoomed x axis, the whole series if the axis is not zoomed
+    """
+    if relayout and "xaxis.range[0]" in relayout:
+        low, high = relayout["xaxis.range[0]"], relayout["xaxis.range[1]"]
+    elif relayout and "xaxis.range" in relayout:
+        low, high = relayout["xaxis.range"]
+    else:
+        return 0, n
+    start = min(max(int(np.floor(low)), 0), max(n - 1, 0))
+    return start, max(min(int(np.ceil(high)) + 1, n), start + 1)
+
+
+def price_figure(x, data, x_range=None, y_range=None):
+    """
+    Price chart as a WebGL trace, the axes scale to the data if no range is given
+    """
     layout = go.Layout(
         title="Simulated Prices",
         plot_bgcolor="#FFF",
         xaxis=dict(
-            range=[0, len(data)],
+            range=x_range,
+            autorange=x_range is None,
             title="Price Evolution",
             linecolor="#BCCCDC",
             showgrid=False
         ),
         yaxis=dict(
-            range=[min(data), max(data)],
+            range=y_range,
+            autorange=y_range is None,
             title="Prices",
             linecolor="#BCCCDC",
             showgrid=False,
@@ -158,20 +243,49 @@ def update_graph(data):
     )
 
     figure = go.Figure(
-        data=go.Scatter(x=[i for i in range(len(data))], y=data, marker_color="dodgerblue", opacity=0.8),
+        data=go.Scattergl(x=x, y=data, marker_color="dodgerblue", opacity=0.8),
         layout=layout
     )
 
     return figure
 
 
+@app.callback(
+    Output('timeseries', 'figure'),
+    [Input('data_timeseries', "data"),
+     Input('timeseries', "relayoutData"),
+     Input('job_id', "data")],
+    [State('live', "value")],
+)
+def update_graph(data, relayout, job_id, live):
+    triggered = [t["prop_id"] for t in dash.callback_context.triggered]
+    if "job_id.data" in triggered:
+        if live:
+            # empty figure that poll_job extends while the job runs
+            return price_figure([], [])
+        raise PreventUpdate
+
+    prices = results.get(data["run"], "prices") if data else None
+    if prices is None:
+        raise PreventUpdate
+
+    # a zoom re-requests detail of the visible range, new data shows the whole series
+    zoomed = "timeseries.relayoutData" in triggered
+    start, stop = visible_range(relayout, len(prices)) if zoomed else (0, len(prices))
+    x, data = downsample(prices, MAX_POINTS, DOWNSAMPLING, start, stop)
+
+    return price_figure(x, data, [start, stop - 1], [data.min(), data.max()])
+
+
 @app.callback(Output('bar', 'figure'),
-              [Input('data_bar', "children")],
+              [Input('data_bar', "data")],
               )
 def update_bar(data):
-    data = pd.read_json(data)
+    pnl = results.get(data["run"], "pnl") if data else None
+    if pnl is None:
+        raise PreventUpdate
+    data = pd.DataFrame({"Trader": results.get(data["run"], "traders"), "PNL": pnl})
 
-    print(data)
     fundamentalists = data[data['Trader'].str.contains("fundamentalist")]
     chartists = data[data['Trader'].str.contains("chartist")]
     xs = ["Fundamentalists", "Chartists"]
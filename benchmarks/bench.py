@@ -0,0 +1,263 @@
+"""
+Benchmarks of the engine hot paths.
+
+    python -m benchmarks.bench --save baseline.json
+    python -m benchmarks.bench --compare baseline.json --threshold 0.1
+
+Every benchmark is repeated and the fastest repetition is kept. Results are compared by time per operation, a
+benchmark is a regression if it is slower than the baseline by more than the threshold. The comparison exits with
+status 1 if any benchmark regressed. Benchmarks of the baseline that did not run are reported as missing. A baseline
+saved with a different --quick measured other sizes and is refused, a different --repeat only gives a warning.
+"""
+import argparse
+import fnmatch
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+
+from market_sim.markets import OrderBook, Order, LIMIT, MARKET
+from market_sim.pnl import PnL
+from market_sim.portfolio import PortfolioManager
+from market_sim.indicators.rolling import RollingIndicator
+from market_sim.simulation import Simulation
+
+
+def _fill_book(book_, depth_, orders_per_level_, quantity_):
+    """
+    Rests orders_per_level_ orders on depth_ levels of both sides around a mid price of 100
+    """
+    for level in range(1, depth_ + 1):
+        for _ in range(orders_per_level_):
+            book_.push(Order(LIMIT, "fundamentalist_0", quantity_, 100 - level))
+            book_.push(Order(LIMIT, "fundamentalist_0", -quantity_, 100 + level))
+
+
+def orderbook_limit(depth_, num_):
+    """
+    Limit orders on both sides with prices inside the book, about half of them cross the spread
+    :param depth_: number of price levels per side of the initial book
+    :param num_: number of orders
+    :return: tuple (seconds, operations)
+    """
+    rng = np.random.default_rng(0)
+    book = OrderBook()
+    _fill_book(book, depth_, 5, 10)
+    sides = rng.choice((-1, 1), size=num_)
+    prices = (100 + rng.integers(-depth_, depth_ + 1, size=num_)).tolist()
+    quantities = (sides * rng.integers(1, 20, size=num_)).tolist()
+    orders = [Order(LIMIT, "fundamentalist_1", q, p) for q, p in zip(quantities, prices)]
+
+    start = time.perf_counter()
+    for order in orders:
+        book.push(order)
+    return time.perf_counter() - start, num_
+
+
+def orderbook_market(depth_, num_):
+    """
+    Small market orders alternating between buy and sell against a deep book that they never exhaust
+    :param depth_: number of price levels per side of the book
+    :param num_: number of orders
+    :return: tuple (seconds, operations)
+    """
+    book = OrderBook()
+    _fill_book(book, depth_, 5, 10 * num_)
+    orders = [Order(MARKET, "chartist_1", 5 if i % 2 else -5) for i in range(num_)]
+
+    start = time.perf_counter()
+    for order in orders:
+        book.push(order)
+    return time.perf_counter() - start, num_
+
+
+def simulation(length_, num_fund_, num_chart_, cohort_=None):
+    """
+    Simulation.start, one operation is one trader acting in one period
+    :return: tuple (seconds, operations)
+    """
+    sim = Simulation(length_, num_fund_, num_chart_, (100, 3), (6, 2), cohort_=cohort_, seed_=0)
+    start = time.perf_counter()
+    sim.start()
+    return time.perf_counter() - start, length_ * (num_fund_ + num_chart_)
+
+
+def pnl_push(num_):
+    pnl = PnL()
+    pnl.push(0.0, 100)
+    prices = (100 + np.random.default_rng(0).normal(size=num_)).tolist()
+    quantities = [(i % 7) - 3 for i in range(num_)]
+
+    start = time.perf_counter()
+    for price, quantity in zip(prices, quantities):
+        pnl.push(price, quantity)
+    return time.perf_counter() - start, num_
+
+
+def portfolio_update(num_):
+    portfolio = PortfolioManager(10000.0, 100, 1.0, "fundamentalist_1")
+    prices = (100 + np.random.default_rng(0).normal(size=num_)).tolist()
+    quantities = [(i % 7) - 3 for i in range(num_)]
+
+    start = time.perf_counter()
+    for price, quantity in zip(prices, quantities):
+        portfolio.update(price, quantity)
+    return time.perf_counter() - start, num_
+
+
+def rolling_indicator_push(window_, num_):
+    indicator = RollingIndicator(window_)
+    prices = (100 + np.random.default_rng(0).normal(size=num_)).tolist()
+
+    start = time.perf_counter()
+    for price in prices:
+        indicator.push(price)
+    return time.perf_counter() - start, num_
+
+
+def dash_callback():
+    """
+    One run of the app with its default inputs: submit the job, wait for it, poll it and build both figures
+    :return: tuple (seconds, operations)
+    """
+    import app as dash_app
+
+    def call(callback_, *args):
+        return getattr(callback_, "__wrapped__", callback_)(*args)
+
+    inputs = (10, 30, 5, 100, 3, 6, 2) # length, n_fund, n_chart, f_dist_mean, f_dist_var, c_dist_mean, c_dist_var
+    with dash_app.server.test_request_context():
+        start = time.perf_counter()
+        job_id = call(dash_app.simulate_data, 1, *inputs, None)
+        while not dash_app.jobs.get(job_id).finished():
+            time.sleep(0.0005)
+        # the first poll of a job sets up its poll state, the second collects the results
+        poll_state = call(dash_app.poll_job, 1, job_id, [], None)[5]
+        data_timeseries, data_bar = call(dash_app.poll_job, 2, job_id, [], poll_state)[:2]
+        call(dash_app.update_graph, data_timeseries, None, job_id, []).to_json()
+        call(dash_app.update_bar, data_bar).to_json()
+        return time.perf_counter() - start, 1
+
+
+def benchmarks(quick_=False):
+    """
+    All benchmarks by name
+    :param quick_: smaller sizes, for a fast sanity check
+    :return: dict of name to function without arguments
+    """
+    n = 2000 if quick_ else 20000
+    scale = (1, 4) if quick_ else (1, 4, 16)
+    suite = {}
+    for depth in (1, 10, 100):
+        suite["orderbook.limit.depth{}".format(depth)] = lambda d=depth: orderbook_limit(d, n)
+        suite["orderbook.market.depth{}".format(depth)] = lambda d=depth: orderbook_market(d, n)
+    for k in scale:
+        suite["simulation.length{}".format(10 * k)] = lambda k=k: simulation(10 * k, 30, 5)
+        suite["simulation.num_fund{}".format(30 * k)] = lambda k=k: simulation(10, 30 * k, 5)
+        suite["simulation.num_chart{}".format(5 * k)] = lambda k=k: simulation(10, 30, 5 * k)
+    suite["simulation.batch.num_fund{}".format(30 * scale[-1])] = lambda: simulation(10, 30 * scale[-1], 5, "batch")
+    suite["pnl.push"] = lambda: pnl_push(n)
+    suite["portfolio.update"] = lambda: portfolio_update(n)
+    suite["rolling_indicator.push"] = lambda: rolling_indicator_push(20, n)
+    suite["dash.callback"] = dash_callback
+    return suite
+
+
+def run(names_, suite_, repeat_):
+    """
+    Runs benchmarks, a benchmark whose dependencies are missing (the app needs dash) is skipped
+    :param names_: names to run
+    :param suite_: dict of name to function
+    :param repeat_: repetitions per benchmark, the fastest is kept
+    :return: dict of name to result
+    """
+    results = {}
+    for name in names_:
+        try:
+            seconds, ops = min(suite_[name]() for _ in range(repeat_))
+        except ImportError as e:
+            print("{:<32} skipped ({})".format(name, e))
+            continue
+        results[name] = {"seconds": seconds, "ops": ops, "us_per_op": 1e6 * seconds / ops}
+        print("{:<32} {:>12.3f} us/op {:>12.0f} ops/s".format(name, 1e6 * seconds / ops, ops / seconds))
+    return results
+
+
+def compare(results_, baseline_, threshold_):
+    """
+    Prints the change against a baseline
+    :param results_: dict of name to result
+    :param baseline_: dict of name to result
+    :param threshold_: relative slowdown that counts as a regression
+    :return: list of names that regressed
+    """
+    regressions = []
+    for name in baseline_:
+        if name not in results_:
+            print("{:<32} {:>8} MISSING".format(name, ""))
+    for name, result in results_.items():
+        if name not in baseline_:
+            print("{:<32} {:>8} new".format(name, ""))
+            continue
+        ratio = result["us_per_op"] / baseline_[name]["us_per_op"]
+        flag = ""
+        if ratio > 1 + threshold_:
+            flag = "REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 - threshold_:
+            flag = "faster"
+        print("{:<32} {:>+8.1%} {}".format(name, ratio - 1, flag))
+    return regressions
+
+
+def main(argv_=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", help="write the results as a json baseline")
+    parser.add_argument("--compare", help="json baseline to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown flagged as a regression")
+    parser.add_argument("--repeat", type=int, default=5, help="repetitions per benchmark")
+    parser.add_argument("--only", default="*", help="glob pattern of the benchmarks to run")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes")
+    args = parser.parse_args(argv_)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        meta = baseline["meta"]
+        if meta["quick"] != args.quick:
+            parser.error("the baseline was saved {} --quick".format("with" if meta["quick"] else "without"))
+        if meta["repeat"] != args.repeat:
+            print("warning: the baseline was saved with --repeat {}, this run uses {}".format(meta["repeat"],
+                                                                                      args.repeat), file=sys.stderr)
+
+    suite = benchmarks(args.quick)
+    names = [name for name in suite if fnmatch.fnmatch(name, args.only)]
+    results = run(names, suite, args.repeat)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "meta": {
+                    "python": platform.python_version(),
+                    "numpy": np.__version__,
+                    "platform": platform.platform(),
+                    "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "quick": args.quick,
+                    "repeat": args.repeat,
+                },
+                "results": results,
+            }, f, indent=2)
+
+    if baseline is not None:
+        # benchmarks excluded by --only are not missing
+        selected = {name: result for name, result in baseline["results"].items() if fnmatch.fnmatch(name, args.only)}
+        if compare(results, selected, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
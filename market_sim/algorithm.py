@@ -1,4 +1,5 @@
 from .portfolio import PortfolioManager
+from . import events
 
 
 class Algorithms:
@@ -10,7 +11,8 @@ class Algorithms:
         self.initial_margin = 1.0 # set via config
         self.quantity = 100 # set via config
         self.market_price = 0.0
-        self.portfolio = PortfolioManager(self.cash, self.quantity, self.initial_margin, self.trader_id)
+        self.portfolio = PortfolioManager(self.cash, self.quantity, self.initial_margin, self.trader_id, self.events,
+                                          self.pool)
         
         self.order = 0
 
@@ -21,6 +23,8 @@ class Algorithms:
         :param position_: float of position
         :return:
         """
+        if self.events.level <= events.DEBUG:
+            self.events.emit(events.DEBUG, events.Event(events.SIGNAL, self.trader_id, self.market_price, position_))
         self.portfolio.push(self.market_price, position_)
 
         self.order = self.portfolio.create_order(self.value)
@@ -0,0 +1,302 @@
+"""
+On-disk record of a simulation run, written while the run progresses. Every table is stored column by column in
+fixed-size chunks, one .npy file per column and chunk (<table>.<column>.<chunk>.npy), next to manifest.json that
+lists the tables, dtypes and chunk lengths. The manifest is rewritten whenever a chunk is written, so an unfinished
+run can be read up to its last chunk. RunReader opens the chunks with np.load(mmap_mode="r").
+
+Tables:
+trades: the columns of TradeTape, traders by their index in manifest["traders"]
+prices: the market price after every order, like Simulation.market_prices
+periods: one row per period from Simulation.iter_periods, best_bid / best_ask are nan while a side is empty
+pnl: final pnl per trader, written once by RunWriter.finish
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .tape import TradeTape, expand
+
+VERSION = 1
+TABLES = {
+    "trades": TradeTape.COLUMNS,
+    "prices": (("price", np.float64),),
+    "periods": (
+        ("period", np.int64),
+        ("price", np.float64),
+        ("volume", np.int64),
+        ("trades", np.int64),
+        ("best_bid", np.float64),
+        ("best_ask", np.float64),
+    ),
+    "pnl": (
+        ("trader", np.int32),
+        ("pnl", np.float64),
+    ),
+}
+
+
+class ChunkedTable:
+    """
+    Buffers the rows of one table and writes every full chunk to disk. Rows of scalars (append_row) are collected
+    in a list and moved into the buffers with one slice assignment per column, arrays (append) are copied directly.
+    """
+
+    def __init__(self, path_, name_, columns_, chunk_size_):
+        self.path = path_
+        self.name = name_
+        self.chunk_size = chunk_size_
+        self.buffers = {column: np.empty(chunk_size_, dtype) for column, dtype in columns_}
+        self.size = 0 # rows in the buffers
+        self.rows = [] # rows of append_row, after the rows in the buffers
+        self.chunks = [] # rows of the written chunks
+
+    def append_row(self, *values):
+        """
+        Appends one row
+        :param values: one scalar per column, in the order of the columns
+        :return: True if a chunk was written
+        """
+        self.rows.append(values)
+        if self.size + len(self.rows) == self.chunk_size:
+            self.write()
+            return True
+        return False
+
+    def flush_rows(self):
+        """
+        Moves the rows of append_row into the buffers
+        :return:
+        """
+        if not self.rows:
+            return
+        n = len(self.rows)
+        for buffer, values in zip(self.buffers.values(), zip(*self.rows)):
+            buffer[self.size:self.size + n] = values
+        self.size += n
+        self.rows = []
+
+    def append(self, **columns):
+        """
+        Appends rows, every column gets an array (or a scalar for all rows) of the same length
+        :param columns: values by column name
+        :return: True if a chunk was written
+        """
+        self.flush_rows()
+        columns = {column: np.asarray(values) for column, values in columns.items()}
+        n = max((values.size for values in columns.values()), default=0)
+        written = False
+        start = 0
+        while start < n:
+            stop = min(n, start + self.chunk_size - self.size)
+            for column, values in columns.items():
+                self.buffers[column][self.size:self.size + stop - start] = values[start:stop] if values.ndim else values
+            self.size += stop - start
+            start = stop
+            if self.size == self.chunk_size:
+                self.write()
+                written = True
+        return written
+
+    def write(self):
+        self.flush_rows()
+        if not self.size:
+            return
+        k = len(self.chunks)
+        for column, buffer in self.buffers.items():
+            np.save(os.path.join(self.path, "{}.{}.{:05d}.npy".format(self.name, column, k)), buffer[:self.size])
+        self.chunks.append(self.size)
+        self.size = 0
+
+    def describe(self):
+        return {"columns": {column: buffer.dtype.str for column, buffer in self.buffers.items()},
+                "chunks": self.chunks}
+
+
+class RunWriter:
+    """
+    Writes a run to a directory in chunks while it is simulated, pass it to Simulation as archive_ and call finish
+    when the run is done. Memory use is about one chunk per table whatever the length of the run: like TradeTape,
+    record_trades only queues the Fills of an order and they are expanded once they fill a chunk. A writer owns its
+    directory: it refuses a directory that already holds a run and cannot be pickled, a restored or forked
+    Simulation writes to a new RunWriter (see checkpoint.load).
+    """
+
+    def __init__(self, path_, chunk_size_=65536):
+        """
+        :param path_: directory of the run, created if needed, must not hold a run yet
+        :param chunk_size_: rows per chunk
+        """
+        if os.path.exists(os.path.join(path_, "manifest.json")):
+            raise FileExistsError("A run was already written to " + path_)
+        os.makedirs(path_, exist_ok=True)
+        self.path = path_
+        self.tables = {name: ChunkedTable(path_, name, columns, chunk_size_) for name, columns in TABLES.items()}
+        self.traders = []
+        self.index = {} # trader id -> index
+        self.sequence = 0
+        self.pending = [] # (period, Fills) not yet in the trades table
+        self.pending_rows = 0
+        self.complete = False
+        self.write_manifest()
+
+    def __getstate__(self):
+        raise TypeError("RunWriter cannot be pickled, a copy would overwrite the chunks of its run")
+
+    def set_traders(self, trader_ids_):
+        """
+        :param trader_ids_: trader ids in the order of their index
+        :return:
+        """
+        self.traders = list(trader_ids_)
+        self.index = {trader: i for i, trader in enumerate(self.traders)}
+        self.write_manifest()
+
+    def record_trades(self, period_, fills_):
+        """
+        Appends the fills of one incoming order, see TradeTape.record
+        :param period_: simulation period
+        :param fills_: Fills of the order, not modified afterwards
+        :return:
+        """
+        self.pending.append((period_, fills_))
+        self.pending_rows += len(fills_)
+        if self.pending_rows >= self.tables["trades"].chunk_size:
+            self.flush_trades()
+
+    def flush_trades(self):
+        """
+        Expands the queued fills into the trades table
+        :return:
+        """
+        if not self.pending:
+            return
+        if self.tables["trades"].append(**expand(self.pending, self.index, self.sequence)):
+            self.write_manifest()
+        self.sequence += self.pending_rows
+        self.pending = []
+        self.pending_rows = 0
+
+    def record_price(self, price_):
+        if self.tables["prices"].append_row(price_):
+            self.write_manifest()
+
+    def record_period(self, snapshot_):
+        """
+        :param snapshot_: PeriodSnapshot
+        :return:
+        """
+        best_bid = np.nan if snapshot_.best_bid is None else snapshot_.best_bid
+        best_ask = np.nan if snapshot_.best_ask is None else snapshot_.best_ask
+        if self.tables["periods"].append_row(snapshot_.period, snapshot_.price, snapshot_.volume, snapshot_.trades,
+                                             best_bid, best_ask):
+            self.write_manifest()
+
+    def record_pnl(self, traders_, pnl_):
+        """
+        :param traders_: trader indices
+        :param pnl_: final pnl per trader
+        :return:
+        """
+        if self.tables["pnl"].append(trader=traders_, pnl=pnl_):
+            self.write_manifest()
+
+    def write_manifest(self):
+        manifest = {
+            "version": VERSION,
+            "complete": self.complete,
+            "traders": self.traders,
+            "tables": {name: table.describe() for name, table in self.tables.items()},
+        }
+        path = os.path.join(self.path, "manifest.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f)
+        os.replace(path + ".tmp", path)
+
+    def finish(self, sim_):
+        """
+        Writes the final pnl of a simulation and closes the run
+        :param sim_: Simulation that wrote to this run
+        :return:
+        """
+        if self.complete:
+            raise ValueError("The run is already complete")
+        pnl = sim_.final_pnl()
+        self.record_pnl([sim_.trader_index[name] for name in pnl], list(pnl.values()))
+        self.close()
+
+    def close(self):
+        """
+        Writes the last partial chunks and marks the run complete, finish also writes the pnl
+        :return:
+        """
+        self.flush_trades()
+        for table in self.tables.values():
+            table.write()
+        self.complete = True
+        self.write_manifest()
+
+
+class RunReader:
+    """
+    Reads a run written by RunWriter, chunks are memory-mapped and not copied unless a column spans several chunks
+    """
+
+    def __init__(self, path_):
+        """
+        :param path_: directory of the run
+        """
+        self.path = path_
+        with open(os.path.join(path_, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        if self.manifest["version"] != VERSION:
+            raise ValueError("Unsupported run version " + str(self.manifest["version"]))
+        self.traders = self.manifest["traders"]
+        self.complete = self.manifest["complete"]
+
+    def __len__(self):
+        return sum(self.manifest["tables"]["trades"]["chunks"])
+
+    def chunks(self, table_, column_):
+        """
+        Memory-mapped chunks of a column
+        :param table_: table name, see TABLES
+        :param column_: column name
+        :return: list of np.ndarray (np.memmap)
+        """
+        return [np.load(os.path.join(self.path, "{}.{}.{:05d}.npy".format(table_, column_, k)), mmap_mode="r")
+                for k in range(len(self.manifest["tables"][table_]["chunks"]))]
+
+    def column(self, table_, column_):
+        """
+        A whole column, the memory map itself if it is stored in one chunk
+        :param table_: table name, see TABLES
+        :param column_: column name
+        :return: np.ndarray
+        """
+        chunks = self.chunks(table_, column_)
+        if len(chunks) == 1:
+            return chunks[0]
+        if not chunks:
+            return np.empty(0, dtype=self.manifest["tables"][table_]["columns"][column_])
+        return np.concatenate(chunks)
+
+    def table(self, table_):
+        """
+        :param table_: table name, see TABLES
+        :return: pd.DataFrame
+        """
+        return pd.DataFrame({column: self.column(table_, column)
+                             for column in self.manifest["tables"][table_]["columns"]})
+
+    def market_prices(self):
+        return self.column("prices", "price")
+
+    def pnl_df(self):
+        """
+        Final pnl in the format of Simulation.pnl_df
+        :return: pd.DataFrame with columns Trader and PNL
+        """
+        traders = self.column("pnl", "trader")
+        return pd.DataFrame({"Trader": [self.traders[i] for i in traders.tolist()], "PNL": self.column("pnl", "pnl")})
@@ -0,0 +1,198 @@
+"""
+Checkpoints of a running Simulation: order book, portfolios and pnl, indicator windows, trade tape and the state of
+the random generator. A warmed-up simulation is saved once and restored, or forked in memory, into several
+continuations, e.g. branch.length += 1000; branch.start().
+
+File layout: MAGIC, little endian uint16 format version, source fingerprint, zlib compressed pickle of the
+Simulation. Event sinks and the shared NO_POOL are not written, a restored simulation gets the sink passed to load.
+A DepthRecorder or RunWriter is not written either, its files stay with the original run: pass a recorder or
+writer with a new directory to load or fork to keep recording the continuation.
+By default neither is the history of the run (market_prices, the trade tape and the dataframes of create_dfs), a
+restored or forked simulation records from where it continues.
+
+Checkpoints are pickles of the classes of market_sim, they are only valid for the source of those classes that wrote
+them: load refuses a checkpoint whose fingerprint (a hash of the modules in _PICKLED_MODULES) differs, changes to the
+app, the jobs or the analysis modules keep checkpoints valid. VERSION is bumped when the file layout or the persistent
+ids change. Only load files from a trusted source.
+"""
+import hashlib
+import io
+import os
+import pickle
+import struct
+import zlib
+
+from . import events
+from .markets import NO_POOL
+from .depth import DepthRecorder
+from .archive import RunWriter
+from .tape import TradeTape
+
+MAGIC = b"MSIMCKPT"
+VERSION = 2
+_HEADER = struct.Struct("<8sH")
+_FINGERPRINT_SIZE = 8
+# modules that define the classes pickled with a Simulation (and their base classes), relative to the package
+_PICKLED_MODULES = ("simulation.py", "markets.py", "traders.py", "algorithm.py", "portfolio.py", "pnl.py", "tape.py",
+                    "profiling.py", "indicators/rolling.py")
+_fingerprint = None
+
+
+def fingerprint():
+    """
+    Hash of the source of the modules whose classes are pickled, computed once
+    :return: 8 bytes
+    """
+    global _fingerprint
+    if _fingerprint is None:
+        package = os.path.dirname(os.path.abspath(__file__))
+        digest = hashlib.sha1()
+        for name in _PICKLED_MODULES:
+            digest.update(name.encode())
+            with open(os.path.join(package, *name.split("/")), "rb") as f:
+                digest.update(f.read())
+        _fingerprint = digest.digest()[:_FINGERPRINT_SIZE]
+    return _fingerprint
+
+
+class _Pickler(pickle.Pickler):
+
+    def __init__(self, file_, sim_, history_):
+        pickle.Pickler.__init__(self, file_, pickle.HIGHEST_PROTOCOL)
+        self.history = {}
+        if not history_:
+            self.history = {id(sim_.market_prices): "market_prices", id(sim_.tape): "tape"}
+            for df in (sim_.market_prices_df, sim_.pnl_df):
+                if df is not None:
+                    self.history[id(df)] = "no_history"
+
+    def persistent_id(self, obj):
+        if isinstance(obj, events.EventSink):
+            return "events"
+        if obj is NO_POOL:
+            return "no_pool"
+        if isinstance(obj, DepthRecorder):
+            return "depth"
+        if isinstance(obj, RunWriter):
+            return "archive"
+        pid = self.history.get(id(obj))
+        if pid == "tape":
+            # an empty tape is restored, sharing the trader index of the simulation
+            return pid, obj.traders
+        return pid
+
+
+class _Unpickler(pickle.Unpickler):
+
+    def __init__(self, file_, events_, depth_, archive_):
+        pickle.Unpickler.__init__(self, file_)
+        self.events = events_
+        self.depth = depth_
+        self.archive = archive_
+
+    def persistent_load(self, pid):
+        if pid == "events":
+            return self.events
+        if pid == "no_pool":
+            return NO_POOL
+        if pid == "depth":
+            return self.depth
+        if pid == "archive":
+            return self.archive
+        if pid == "market_prices":
+            return []
+        if isinstance(pid, tuple) and pid[0] == "tape":
+            return TradeTape(pid[1])
+        if pid == "no_history":
+            return None
+        raise pickle.UnpicklingError("Unknown persistent id " + str(pid))
+
+
+def _dump(sim_, history_):
+    buffer = io.BytesIO()
+    _Pickler(buffer, sim_, history_).dump(sim_)
+    return buffer.getvalue()
+
+
+def _load(data_, events_, depth_=None, archive_=None):
+    sim = _Unpickler(io.BytesIO(data_), events_, depth_, archive_).load()
+    if sim.archive is not None:
+        sim.archive.set_traders(sim.trader_index)
+    return sim
+
+
+def dumps(sim_, level_=6, history_=False):
+    """
+    Serializes a simulation
+    :param sim_: Simulation
+    :param level_: zlib compression level
+    :param history_: include market_prices, the trade tape and the dataframes, which grow with the run
+    :return: bytes
+    """
+    return _HEADER.pack(MAGIC, VERSION) + fingerprint() + zlib.compress(_dump(sim_, history_), level_)
+
+
+def loads(data_, events_=events.NULL_SINK, depth_=None, archive_=None):
+    """
+    Restores a simulation
+    :param data_: bytes written by dumps
+    :param events_: event sink of the restored simulation
+    :param depth_: DepthRecorder of the restored simulation if the saved one recorded depth, None to stop recording
+    :param archive_: RunWriter of the restored simulation if the saved one wrote a run, None to stop writing
+    :return: Simulation
+    """
+    magic, version = _HEADER.unpack_from(data_)
+    if magic != MAGIC:
+        raise ValueError("Not a simulation checkpoint")
+    if version != VERSION:
+        raise ValueError("Unsupported checkpoint version " + str(version))
+    start = _HEADER.size + _FINGERPRINT_SIZE
+    if data_[_HEADER.size:start] != fingerprint():
+        raise ValueError("Checkpoint was written by a different revision of market_sim")
+    return _load(zlib.decompress(data_[start:]), events_, depth_, archive_)
+
+
+def save(sim_, path_, level_=6, history_=False):
+    """
+    Writes a checkpoint file
+    :param sim_: Simulation
+    :param path_: file path
+    :param level_: zlib compression level
+    :param history_: include market_prices, the trade tape and the dataframes
+    :return:
+    """
+    with open(path_, "wb") as f:
+        f.write(dumps(sim_, level_, history_))
+
+
+def load(path_, events_=events.NULL_SINK, depth_=None, archive_=None):
+    """
+    Reads a checkpoint file
+    :param path_: file path
+    :param events_: event sink of the restored simulation
+    :param depth_: DepthRecorder of the restored simulation, see loads
+    :param archive_: RunWriter of the restored simulation, see loads
+    :return: Simulation
+    """
+    with open(path_, "rb") as f:
+        return loads(f.read(), events_, depth_, archive_)
+
+
+def fork(sim_, num_=1, events_=None, history_=False, depths_=None, archives_=None):
+    """
+    Copies a simulation in memory, the state is serialized once and every branch is an independent copy
+    :param sim_: Simulation
+    :param num_: number of branches
+    :param events_: event sink of the branches, the sink of sim_ by default
+    :param history_: copy market_prices, the trade tape and the dataframes into every branch
+    :param depths_: one DepthRecorder per branch if sim_ records depth, by default the branches do not record it
+    :param archives_: one RunWriter per branch if sim_ writes a run, by default the branches do not write one
+    :return: list of Simulation
+    """
+    depths = [None] * num_ if depths_ is None else depths_
+    archives = [None] * num_ if archives_ is None else archives_
+    if len(depths) != num_ or len(archives) != num_:
+        raise ValueError("Expected one depth recorder and run writer per branch")
+    data = _dump(sim_, history_)
+    sink = sim_.events if events_ is None else events_
+    return [_load(data, sink, depth, archive) for depth, archive in zip(depths, archives)]
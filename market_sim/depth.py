@@ -0,0 +1,203 @@
+"""
+Level 2 depth history of an OrderBook. The recorder compares the n best levels of both sides with the previous
+snapshot and appends only the levels that changed (size 0 marks a level that left the top n). While the top n levels
+of both sides stay the same from one order to the next, only the levels the order swept or rested at are compared.
+Every keyframe_every_ snapshots the full top n is written as a keyframe, so the reader finds the last keyframe by
+binary search and replays at most keyframe_every_ snapshots of deltas.
+
+Files in the recorder's directory, all append-only and read with np.memmap:
+deltas.bin (LEVEL records), levels.bin (LEVEL records of the keyframes), keyframes.bin (KEYFRAME records) and
+meta.json.
+"""
+import bisect
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from .markets import BUY, SELL
+
+VERSION = 1
+LEVEL = np.dtype([("seq", "<i8"), ("side", "i1"), ("price", "<f8"), ("size", "<i8"), ("orders", "<i8")])
+# delta: number of delta records up to and including the keyframe's snapshot, level: first record in levels.bin
+KEYFRAME = np.dtype([("seq", "<i8"), ("delta", "<i8"), ("level", "<i8")])
+DEPTH = np.dtype([("price", "<f8"), ("size", "<i8"), ("orders", "<i8")])
+
+# buy and sell levels best first, as DEPTH arrays
+Depth = namedtuple("Depth", ["seq", "buy", "sell"])
+
+
+class DepthRecorder:
+    """
+    Records the top depth_ levels after every order (per_order_) or at the end of every period. The sequence number
+    of a snapshot is the number of orders the book has received, or the period when recording per period.
+    Call close (or flush before reading) when the run is done.
+    """
+
+    def __init__(self, path_, depth_=10, keyframe_every_=1000, per_order_=True, chunk_size_=4096):
+        """
+        :param path_: directory of the files, created if needed
+        :param depth_: number of levels per side
+        :param keyframe_every_: number of snapshots between keyframes
+        :param per_order_: snapshot after every order, otherwise once per period
+        :param chunk_size_: number of delta records buffered before they are written
+        """
+        os.makedirs(path_, exist_ok=True)
+        self.path = path_
+        self.depth = depth_
+        self.keyframe_every = keyframe_every_
+        self.per_order = per_order_
+        with open(os.path.join(path_, "meta.json"), "w") as f:
+            json.dump({"version": VERSION, "depth": depth_, "keyframe_every": keyframe_every_,
+                       "per_order": per_order_}, f)
+        self.files = {name: open(os.path.join(path_, name + ".bin"), "wb")
+                      for name in ("deltas", "levels", "keyframes")}
+
+        self.levels = {} # (side, price) -> (size, orders) of the last snapshot
+        self.tops = None # top_version of the buy and sell levels at the last snapshot
+        self.seq = None # sequence number of the last snapshot
+        self.snapshots = 0
+        self.num_deltas = 0
+        self.num_levels = 0
+        self.buffer = np.empty(chunk_size_, dtype=LEVEL)
+        self.buffered = 0
+
+    def record(self, book_, seq_):
+        """
+        Takes a snapshot of the book
+        :param book_: OrderBook
+        :param seq_: int sequence number, not decreasing
+        :return:
+        """
+        tops = (book_.ask_book_prices.top_version, book_.bid_book_prices.top_version)
+        if self.per_order and tops == self.tops and seq_ == self.seq + 1:
+            self.record_touched(book_, seq_)
+        else:
+            buy, sell = book_.get_depth(self.depth)
+            current = {}
+            for side, levels in ((BUY, buy), (SELL, sell)):
+                for price, size, orders in levels:
+                    current[(side, price)] = (size, orders)
+
+            previous = self.levels
+            for key, value in current.items():
+                if previous.get(key) != value:
+                    self.append(seq_, key, value)
+            for key in previous:
+                if key not in current:
+                    self.append(seq_, key, (0, 0))
+            self.levels = current
+            self.tops = (book_.ask_book_prices.top_version, book_.bid_book_prices.top_version)
+        self.seq = seq_
+
+        if self.snapshots % self.keyframe_every == 0:
+            self.write_keyframe(seq_)
+        self.snapshots += 1
+
+    def record_touched(self, book_, seq_):
+        """
+        Compares the levels the last order changed, the other levels of the top n are the same as in the last
+        snapshot. Deltas come in the order of a full comparison, buy levels first
+        :param book_: OrderBook
+        :param seq_: int sequence number
+        :return:
+        """
+        touched = (book_.rested, book_.swept)
+        if book_.swept is not None and book_.swept[0] == BUY:
+            touched = (book_.swept, book_.rested)
+        levels = self.levels
+        for key in touched:
+            if key is not None and key in levels:
+                level = (book_.ask_book if key[0] == BUY else book_.bid_book)[key[1]]
+                value = (level["size"], level["number_orders"])
+                if levels[key] != value:
+                    levels[key] = value
+                    self.append(seq_, key, value)
+
+    def append(self, seq_, key_, value_):
+        if self.buffered == len(self.buffer):
+            self.flush_buffer()
+        self.buffer[self.buffered] = (seq_, key_[0], key_[1], value_[0], value_[1])
+        self.buffered += 1
+        self.num_deltas += 1
+
+    def write_keyframe(self, seq_):
+        levels = np.array([(seq_, side, price, size, orders) for (side, price), (size, orders) in self.levels.items()],
+                          dtype=LEVEL)
+        levels.tofile(self.files["levels"])
+        np.array([(seq_, self.num_deltas, self.num_levels)], dtype=KEYFRAME).tofile(self.files["keyframes"])
+        self.num_levels += len(levels)
+
+    def flush_buffer(self):
+        self.buffer[:self.buffered].tofile(self.files["deltas"])
+        self.buffered = 0
+
+    def flush(self):
+        """
+        Writes all buffered records, the files can be read afterwards
+        :return:
+        """
+        self.flush_buffer()
+        for f in self.files.values():
+            f.flush()
+
+    def close(self):
+        self.flush()
+        for f in self.files.values():
+            f.close()
+
+
+def _map(path_, name_, dtype_):
+    path = os.path.join(path_, name_ + ".bin")
+    if os.path.getsize(path) == 0:
+        return np.empty(0, dtype=dtype_)
+    return np.memmap(path, dtype=dtype_, mode="r")
+
+
+class DepthReader:
+    """
+    Reconstructs the top of the book at any sequence number from the files of a DepthRecorder
+    """
+
+    def __init__(self, path_):
+        """
+        :param path_: directory of a (flushed or closed) DepthRecorder
+        """
+        with open(os.path.join(path_, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta["version"] != VERSION:
+            raise ValueError("Unsupported depth history version " + str(self.meta["version"]))
+        self.deltas = _map(path_, "deltas", LEVEL)
+        self.levels = _map(path_, "levels", LEVEL)
+        self.keyframes = _map(path_, "keyframes", KEYFRAME)
+
+    def __getitem__(self, seq_):
+        return self.book_at(seq_)
+
+    def book_at(self, seq_):
+        """
+        Top of the book after the last snapshot with a sequence number up to seq_
+        :param seq_: int sequence number
+        :return: Depth, empty before the first snapshot
+        """
+        i = bisect.bisect_right(self.keyframes["seq"], seq_) - 1
+        if i < 0:
+            return Depth(seq_, np.empty(0, dtype=DEPTH), np.empty(0, dtype=DEPTH))
+        keyframe = self.keyframes[i]
+        stop = self.keyframes["level"][i + 1] if i + 1 < len(self.keyframes) else len(self.levels)
+
+        state = {}
+        for record in self.levels[keyframe["level"]:stop].tolist():
+            state[(record[1], record[2])] = (record[3], record[4])
+        end = bisect.bisect_right(self.deltas["seq"], seq_, lo=int(keyframe["delta"]))
+        for record in self.deltas[keyframe["delta"]:end].tolist():
+            if record[3] == 0:
+                state.pop((record[1], record[2]), None)
+            else:
+                state[(record[1], record[2])] = (record[3], record[4])
+
+        buy = sorted(((price, size, orders) for (side, price), (size, orders) in state.items() if side == BUY),
+                     reverse=True)
+        sell = sorted((price, size, orders) for (side, price), (size, orders) in state.items() if side == SELL)
+        return Depth(seq_, np.array(buy, dtype=DEPTH), np.array(sell, dtype=DEPTH))
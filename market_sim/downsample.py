@@ -0,0 +1,100 @@
+"""
+Visual downsampling of long series before they are plotted. Both methods keep the first and the last point and
+return indices into the input, so any slice of a stored series can be reduced without copying it first.
+"""
+import numpy as np
+
+
+def _buckets(n_, threshold_):
+    """
+    Edges of threshold_ - 2 buckets over the points between the first and the last one, floor(i * every) + 1 with
+    every = (n_ - 2) / (threshold_ - 2) as in the reference LTTB, in integer arithmetic
+    :param n_: number of points
+    :param threshold_: number of points to keep
+    :return: np.ndarray of int edges, bucket i is [edges[i], edges[i + 1])
+    """
+    return 1 + (np.arange(threshold_ - 1, dtype=np.int64) * (n_ - 2)) // (threshold_ - 2)
+
+
+def lttb(y_, threshold_, x_=None):
+    """
+    Largest-Triangle-Three-Buckets: from every bucket keep the point that forms the largest triangle with the point
+    kept from the previous bucket and the average of the next bucket. The areas of a bucket are computed in one
+    vectorized step, only the walk over the buckets is sequential.
+    :param y_: array of values
+    :param threshold_: number of points to keep, at least 3
+    :param x_: array of x values, the positions 0..n-1 by default
+    :return: np.ndarray of int indices of the kept points
+    """
+    y = np.asarray(y_, dtype=float)
+    n = len(y)
+    if threshold_ >= n or threshold_ < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=float) if x_ is None else np.asarray(x_, dtype=float)
+
+    edges = _buckets(n, threshold_)
+    # averages of every bucket and of the last point, the "next bucket" of bucket i is i + 1
+    sizes = np.diff(edges)
+    avg_x = np.append(np.add.reduceat(x[:-1], edges[:-1]) / sizes, x[-1])
+    avg_y = np.append(np.add.reduceat(y[:-1], edges[:-1]) / sizes, y[-1])
+
+    kept = np.empty(threshold_, dtype=np.int64)
+    kept[0] = 0
+    kept[-1] = n - 1
+    a = 0
+    for i in range(threshold_ - 2):
+        start, stop = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        # twice the triangle area, linear in the candidate point
+        area = np.abs((ax - avg_x[i + 1]) * (y[start:stop] - ay) - (ax - x[start:stop]) * (avg_y[i + 1] - ay))
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+def min_max(y_, threshold_):
+    """
+    Keeps the minimum and the maximum of every bucket, in the order they occur. Fully vectorized, cheaper than lttb
+    and it never drops a spike.
+    :param y_: array of values
+    :param threshold_: number of points to keep, at least 4
+    :return: np.ndarray of int indices of the kept points
+    """
+    y = np.asarray(y_, dtype=float)
+    n = len(y)
+    if threshold_ >= n or threshold_ < 4:
+        return np.arange(n)
+
+    num = (threshold_ - 2) // 2
+    size = -(-(n - 2) // num)
+    num = -(-(n - 2) // size)
+    inner = y[1:-1]
+    # pad the last bucket with its last value, argmin/argmax return the first occurrence so padding is never chosen
+    padded = np.concatenate((inner, np.full(num * size - len(inner), inner[-1]))).reshape(num, size)
+    offsets = 1 + size * np.arange(num)
+    lows = offsets + padded.argmin(axis=1)
+    highs = offsets + padded.argmax(axis=1)
+    inner_kept = np.sort(np.stack((lows, highs), axis=1), axis=1).ravel()
+    return np.concatenate(([0], inner_kept, [n - 1]))
+
+
+def downsample(y_, threshold_, method_="lttb", start_=0, stop_=None):
+    """
+    Reduces a range of a series to about threshold_ points for plotting
+    :param y_: array of values
+    :param threshold_: number of points to keep
+    :param method_: "lttb" or "minmax"
+    :param start_: first position of the range
+    :param stop_: end of the range, the end of the series by default
+    :return: tuple of np.ndarray (positions in y_, values)
+    """
+    y = np.asarray(y_)
+    start, stop, _ = slice(start_, stop_).indices(len(y))
+    window = y[start:stop]
+    if method_ == "lttb":
+        kept = lttb(window, threshold_)
+    elif method_ == "minmax":
+        kept = min_max(window, threshold_)
+    else:
+        raise ValueError("Unknown downsampling method " + str(method_))
+    return kept + start, window[kept]
@@ -0,0 +1,92 @@
+import logging
+from collections import Counter, namedtuple
+
+# levels, compatible with the logging module
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+OFF = logging.CRITICAL + 10
+
+# event types
+ORDER_ACCEPTED = 0
+TRADE = 1
+FILL = 2
+PARTIAL_FILL = 3
+REJECTED = 4
+PRICE = 5
+SIGNAL = 6
+
+EVENT_NAMES = {
+    ORDER_ACCEPTED: "order_accepted",
+    TRADE: "trade",
+    FILL: "fill",
+    PARTIAL_FILL: "partial_fill",
+    REJECTED: "rejected",
+    PRICE: "price",
+    SIGNAL: "signal",
+}
+
+Event = namedtuple("Event", ["kind", "trader_id", "price", "quantity"])
+
+
+class EventSink:
+    """
+    Receives events from the order book, the market and the traders.
+    Emitting code compares its level against sink.level before building an event, so the default sink
+    (level OFF) costs one comparison per call site and nothing else.
+    """
+    def __init__(self, level_=OFF):
+        self.level = level_
+
+    def emit(self, level_, event_):
+        """
+        Handles an event, the base class discards it
+        :param level_: DEBUG or INFO
+        :param event_: Event
+        :return:
+        """
+        pass
+
+
+NULL_SINK = EventSink()
+
+
+class LoggingSink(EventSink):
+    """
+    Forwards events to a logger
+    """
+    def __init__(self, logger_=None, level_=INFO):
+        EventSink.__init__(self, level_)
+        self.logger = logger_ if logger_ is not None else logging.getLogger("market_sim")
+
+    def emit(self, level_, event_):
+        self.logger.log(level_, "%s %s quantity=%s price=%s", EVENT_NAMES[event_.kind], event_.trader_id,
+                        event_.quantity, event_.price)
+
+
+class CounterSink(EventSink):
+    """
+    Counts events per type
+    """
+    def __init__(self, level_=DEBUG):
+        EventSink.__init__(self, level_)
+        self.counts = Counter()
+
+    def emit(self, level_, event_):
+        self.counts[EVENT_NAMES[event_.kind]] += 1
+
+
+class FileSink(EventSink):
+    """
+    Writes one comma separated line per event to a file
+    """
+    def __init__(self, path_, level_=DEBUG):
+        EventSink.__init__(self, level_)
+        self.file = open(path_, "w")
+        self.file.write("event,trader_id,price,quantity\n")
+
+    def emit(self, level_, event_):
+        self.file.write("%s,%s,%s,%s\n" % (EVENT_NAMES[event_.kind], event_.trader_id, event_.price,
+                                           event_.quantity))
+
+    def close(self):
+        self.file.close()
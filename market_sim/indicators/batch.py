@@ -0,0 +1,293 @@
+"""
+Whole-series versions of the streaming indicators in rolling.py.
+Every function takes a price array and returns an array with the value the streaming indicator returns after
+each push, including its warm-up behaviour (0 before the window is full, nan where the streaming class returns nan).
+Sums are built with cumulative sums in the same order as the streaming updates and recursions are run in the same
+order, so both paths agree exactly. The nonlinear recursions (ema, cumulative_statistics) have no closed form that
+rounds like the streaming update, they are run as a loop over Python floats and are exact but not vectorized.
+Requires numpy >= 1.20 (sliding_window_view).
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _lagged(x_, window_):
+    """
+    Value evicted from the window at each push, 0 before the first eviction (RollingIndicator.old_val)
+    :param x_: np.ndarray
+    :param window_: int window length
+    :return: np.ndarray
+    """
+    old = np.zeros(len(x_))
+    old[window_:] = x_[:len(x_) - window_]
+    return old
+
+
+def _rolling_sum(x_, window_):
+    """
+    Running window sum, adding the new value and then subtracting the evicted one like RollingIndicator._update
+    :param x_: np.ndarray
+    :param window_: int window length
+    :return: np.ndarray
+    """
+    n = len(x_)
+    head = x_[:window_]
+    pairs = np.column_stack((x_[window_:], -x_[:max(n - window_, 0)])).ravel()
+    steps = np.cumsum(np.concatenate((head, pairs)))
+    position = np.arange(n)
+    position[window_:] = window_ + 2 * (position[window_:] - window_) + 1
+    return steps[position]
+
+
+def sma(x_, window_):
+    """
+    Simple moving average
+    :param x_: price array
+    :param window_: int window length
+    :return: np.ndarray
+    """
+    x = np.asarray(x_, dtype=float)
+    out = np.zeros(len(x))
+    out[window_ - 1:] = _rolling_sum(x, window_)[window_ - 1:] / float(window_)
+    return out
+
+
+def ema(x_, window_):
+    """
+    Exponential moving average, seeded with the first simple moving average.
+    The recursion runs element by element to round exactly like RollingIndicator.ema
+    :param x_: price array
+    :param window_: int window length
+    :return: np.ndarray
+    """
+    x = np.asarray(x_, dtype=float)
+    sma_ = sma(x, window_).tolist()
+    xs = x.tolist()
+    c = 2 / float(window_ + 1)
+
+    out = [0.0] * len(xs)
+    e = 0
+    for t in range(window_ - 1, len(xs)):
+        if e == 0:
+            e = sma_[t]
+        else:
+            e = (c * xs[t]) + ((1 - c) * e)
+        out[t] = e
+    return np.array(out)
+
+
+def variance(x_, window_):
+    """
+    Moving variance. The streaming update adds one increment per evicted value and reseeds from the window with
+    np.var whenever the variance is exactly 0. Increments are computed at once and accumulated with np.cumsum, which
+    adds sequentially like the streaming update, in blocks that end at the first 0 so that it can be reseeded.
+    :param x_: price array
+    :param window_: int window length
+    :return: np.ndarray, nan while fewer than two values are in the window
+    """
+    x = np.asarray(x_, dtype=float)
+    n = len(x)
+    sma_ = sma(x, window_)
+    sma_old = np.concatenate(([0.0], sma_[:-1]))
+    old = _lagged(x, window_)
+    increment = (x - old) * (x - sma_ + old - sma_old) / window_
+
+    updates = np.flatnonzero(old != 0) # pushes that update the variance
+    values = np.empty(len(updates))
+    k = 0
+    block = 16
+    var = 0.0
+    while k < len(updates):
+        if var == 0:
+            t = updates[k]
+            var = np.var(np.ascontiguousarray(x[t - window_ + 1:t + 1][::-1]))
+            values[k] = var
+            k += 1
+            block = 16
+            continue
+        run = np.cumsum(np.concatenate(([var], increment[updates[k:k + block]])))[1:]
+        zeros = np.flatnonzero(run == 0)
+        stop = zeros[0] + 1 if len(zeros) else len(run)
+        values[k:k + stop] = run[:stop]
+        var = run[stop - 1]
+        k += stop
+        block *= 2
+
+    # the variance stays constant between updates and is 0 before the first one
+    last = np.searchsorted(updates, np.arange(n), side="right") - 1
+    out = np.where(last >= 0, values[np.maximum(last, 0)] if len(values) else 0.0, 0.0)
+    out[:1 if window_ >= 2 else n] = np.nan
+    return out
+
+
+def standard_deviation(x_, window_):
+    """
+    Moving standard deviation
+    :param x_: price array
+    :param window_: int window length
+    :return: np.ndarray
+    """
+    return np.sqrt(variance(x_, window_))
+
+
+def bollinger_band(x_, window_, width_):
+    """
+    Bollinger bands
+    :param x_: price array
+    :param window_: int window length
+    :param width_: the width of the bollinger bands
+    :return: tuple of np.ndarray (upper and lower limit)
+    """
+    sma_ = sma(x_, window_)
+    std = standard_deviation(x_, window_)
+    return sma_ + (std * width_), sma_ - (std * width_)
+
+
+def momentum(x_, window_):
+    """
+    Momentum, the new value minus the value that left the window
+    :param x_: price array
+    :param window_: int window length
+    :return: np.ndarray
+    """
+    x = np.asarray(x_, dtype=float)
+    return x - _lagged(x, window_)
+
+
+def rate_of_change(x_, window_):
+    """
+    Rate of change in percent
+    :param x_: price array
+    :param window_: int window length
+    :return: np.ndarray, inf or nan before the first value leaves the window
+    """
+    x = np.asarray(x_, dtype=float)
+    old = _lagged(x, window_)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (x - old) / old * 100
+
+
+def relative_strength_index(close_, window_):
+    """
+    Relative Strength Index as computed by Indicators
+    :param close_: closing prices
+    :param window_: int window length of Close, at least 2
+    :return: np.ndarray
+    """
+    x = np.asarray(close_, dtype=float)
+    n = len(x)
+    diff = np.zeros(n)
+    diff[1:] = x[1:] - x[:-1]
+    active = _lagged(x, window_) != 0
+
+    gain = np.cumsum(np.where(active & (diff >= 0), diff, 0.0))
+    loss = np.cumsum(np.where(active & (diff < 0), np.abs(diff), 0.0))
+    loss[loss == 0] = np.finfo(float).eps
+    rs = gain / loss
+
+    return 100.0 - (100.0 / (1.0 + rs))
+
+
+def moving_average_convergence_divergence(x_, long_window_, short_window_):
+    """
+    MACD as computed by Indicators, 0 until the long ema is seeded
+    :param x_: price array
+    :param long_window_: int window of the long ema
+    :param short_window_: int window of the short ema
+    :return: np.ndarray
+    """
+    out = ema(x_, short_window_) - ema(x_, long_window_)
+    out[:long_window_ - 1] = 0
+    return out
+
+
+def rolling_max(x_, window_):
+    """
+    Maximum over the window, over all values seen while the window is not full
+    :param x_: price array
+    :param window_: int window length
+    :return: np.ndarray
+    """
+    x = np.asarray(x_, dtype=float)
+    padded = np.concatenate((np.full(window_ - 1, -np.inf), x))
+    return sliding_window_view(padded, window_).max(axis=1)
+
+
+def rolling_min(x_, window_):
+    """
+    Minimum over the window, over all values seen while the window is not full
+    :param x_: price array
+    :param window_: int window length
+    :return: np.ndarray
+    """
+    x = np.asarray(x_, dtype=float)
+    padded = np.concatenate((np.full(window_ - 1, np.inf), x))
+    return sliding_window_view(padded, window_).min(axis=1)
+
+
+def stochastic_oscillator(close_, high_, low_, window_):
+    """
+    Stochastic oscillator
+    :param close_: closing prices
+    :param high_: high prices
+    :param low_: low prices
+    :param window_: int window length of High and Low
+    :return: np.ndarray
+    """
+    min_low = rolling_min(low_, window_)
+    max_high = rolling_max(high_, window_)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100 * (np.asarray(close_, dtype=float) - min_low) / (max_high - min_low)
+
+
+def williams_r(close_, high_, low_, window_):
+    """
+    Williams %R
+    :param close_: closing prices
+    :param high_: high prices
+    :param low_: low prices
+    :param window_: int window length of High and Low
+    :return: np.ndarray
+    """
+    min_low = rolling_min(low_, window_)
+    max_high = rolling_max(high_, window_)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return -100 * (max_high - np.asarray(close_, dtype=float)) / (max_high - min_low)
+
+
+def donchian_channel(high_, low_, window_):
+    """
+    Donchian channel
+    :param high_: high prices
+    :param low_: low prices
+    :param window_: int window length of High and Low
+    :return: tuple of np.ndarray (upper and lower limit)
+    """
+    return rolling_max(high_, window_), rolling_min(low_, window_)
+
+
+def cumulative_statistics(x_):
+    """
+    Cumulative mean and variance as computed by CumulativeStatistics. Welford's update runs element by element to
+    round exactly like the streaming class
+    :param x_: array of values
+    :return: tuple of np.ndarray (mean and variance)
+    """
+    xs = np.asarray(x_, dtype=float).tolist()
+    means = [0.0] * len(xs)
+    variances = [0.0] * len(xs)
+    old_m = new_m = 0
+    old_s = new_s = 0
+    for t, x in enumerate(xs):
+        n = t + 1
+        if n == 1:
+            old_m = new_m = x
+            old_s = 0
+        else:
+            new_m = old_m + (x - old_m) / n
+            new_s = old_s + (x - old_m) * (x - new_m)
+            old_m = new_m
+            old_s = new_s
+        means[t] = new_m
+        variances[t] = new_s / n
+    return np.array(means), np.array(variances)
@@ -1,4 +1,6 @@
 import math
+from collections import deque
+
 import numpy as np
 
 
@@ -69,6 +71,15 @@ class Indicators:
         for key, value in kwargs.items():
             setattr(self, key, RollingIndicator(value))
 
+        # rolling extrema of High and Low, maintained incrementally
+        self._extrema = []
+        if "High" in kwargs:
+            self._max_high = RollingExtremum(kwargs["High"], maximum_=True)
+            self._extrema.append((self.High, self._max_high))
+        if "Low" in kwargs:
+            self._min_low = RollingExtremum(kwargs["Low"])
+            self._extrema.append((self.Low, self._min_low))
+
         self._diff = 0
         self._diff_old = 0
         self._gain = 0
@@ -85,6 +96,8 @@ class Indicators:
         """
         for i, v in enumerate(args):
             getattr(self, self._arg_list[i]).push(v)
+        for indicator, extremum in self._extrema:
+            extremum.push(indicator.new_val)
         self.update()
 
     def update(self):
@@ -113,8 +126,8 @@ class Indicators:
 
         # Update MACD indicator
         if "macd_long" in self._arg_list:
-            if len(self.macd_long.series) > self.macd_long.window:
-                self._macd = self.macd_long._ema - self.macd_short._ema
+            if len(self.macd_long.series) >= self.macd_long.window:
+                self._macd = self.macd_short._ema - self.macd_long._ema
 
     def relative_strength_index(self):
         """
@@ -144,18 +157,74 @@ class Indicators:
         Requires Close, High, Low
         :return: float stochastic oscillator
         """
-        min_low = np.min(self.Low.series)
-        max_high = np.max(self.High.series)
+        min_low = self._min_low.value()
+        max_high = self._max_high.value()
         self._sosc = 100 * (self.Close.new_val - min_low) / (max_high - min_low)
 
         return self._sosc
 
+    def williams_r(self):
+        """
+        Williams %R
+        Requires Close, High, Low
+        :return: float between -100 and 0
+        """
+        min_low = self._min_low.value()
+        max_high = self._max_high.value()
+        return -100 * (max_high - self.Close.new_val) / (max_high - min_low)
+
+    def donchian_channel(self):
+        """
+        Donchian channel
+        Requires High, Low
+        :return: tuple of floats (upper and lower limit)
+        """
+        return self._max_high.value(), self._min_low.value()
+
+
+class RollingExtremum:
+    """
+    Rolling minimum or maximum over a window, kept in a monotonic deque: amortized O(1) per push
+    """
+
+    def __init__(self, window_, maximum_=False):
+        self.window = window_
+        self.maximum = maximum_
+        self._deque = deque()  # (position, value), values monotonic from the front
+        self._n = 0
+
+    def push(self, x_):
+        """
+        Adds a value and drops the values that left the window or can no longer be the extremum
+        :param x_: value of a time series
+        :return:
+        """
+        dq = self._deque
+        if self.maximum:
+            while dq and dq[-1][1] <= x_:
+                dq.pop()
+        else:
+            while dq and dq[-1][1] >= x_:
+                dq.pop()
+        dq.append((self._n, x_))
+        if dq[0][0] <= self._n - self.window:
+            dq.popleft()
+        self._n += 1
+
+    def value(self):
+        """
+        returns the extremum of the window
+        :return: float
+        """
+        return self._deque[0][1]
+
 
 class RollingIndicator:
 
     def __init__(self, window_):
         self.window = window_
-        self.series = []
+        # values in the window, newest first: appendleft and pop are O(1) and keep the values as they were pushed
+        self.series = deque()
         self.old_val = 0
         self.new_val = 0
         self._sum = 0
@@ -172,12 +241,13 @@ class RollingIndicator:
         :param x_: value of a time series
         :return:
         """
-        self.series.insert(0, x_)
+        series = self.series
+        series.appendleft(x_)
         self.new_val = x_
         self._sum += x_
 
-        if len(self.series) > self.window:
-            self.old_val = self.series.pop()
+        if len(series) > self.window:
+            self.old_val = series.pop()
             self._sum -= self.old_val
 
     def push(self, x_):
@@ -204,7 +274,7 @@ class RollingIndicator:
         # Update moving Variance
         if self.old_val != 0:
             if self._var == 0:
-                self._var = np.var([self.series])
+                self._var = np.var(self.series)
             else:
                 self._var += (x - self.old_val) * (x - self._sma + self.old_val - self._sma_old) / (self.window)
 
@@ -269,3 +339,32 @@ class RollingIndicator:
         """
         mom = self.new_val - self.old_val
         return mom
+
+
+class RingBuffer:
+    """
+    Fixed capacity circular buffer of the latest values of a time series
+    """
+
+    def __init__(self, capacity_):
+        self.capacity = capacity_
+        self.buffer = np.zeros(capacity_)
+        self.count = 0
+
+    def push(self, x_):
+        """
+        Overwrites the oldest value
+        :param x_: value of a time series
+        :return:
+        """
+        self.buffer[self.count % self.capacity] = x_
+        self.count += 1
+
+    def lagged(self, lags_):
+        """
+        Gathers the values pushed lags_ steps before the latest one, 0 where the series is not that long yet
+        :param lags_: np.ndarray of lags, each smaller than capacity
+        :return: np.ndarray of values
+        """
+        position = self.count - 1 - lags_
+        return np.where(position >= 0, self.buffer[position % self.capacity], 0.0)
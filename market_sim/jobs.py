@@ -0,0 +1,290 @@
+"""
+Background simulations for the app. Runs are simulated in a pool of worker processes, so they do not compete with
+the web server for the GIL, and stream their prices back through a queue while they progress. A collector thread
+in the server process hands the messages to the Job objects that the callbacks poll.
+
+A job that runs longer than its timeout stops itself, a cancelled job stops at its next progress message. Both are
+cooperative, so the server also fails a running job that has not sent a message for stall_ seconds: its worker was
+killed (e.g. out of memory) and the pool lost the task.
+"""
+import multiprocessing
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from .simulation import Simulation
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_queue = None # result queue of a worker process
+_cancelled = None # ids of the jobs that the server cancelled or gave up on, shared by all workers
+
+
+def _init_worker(queue_, cancelled_):
+    global _queue, _cancelled
+    _queue = queue_
+    _cancelled = cancelled_
+
+
+def _run_job(job_id_, args_, kwargs_, interval_, timeout_):
+    """
+    Simulates one job in a worker, sending the prices of finished periods at most every interval_ seconds
+    :param job_id_: string id of the job
+    :param args_: positional arguments of Simulation
+    :param kwargs_: keyword arguments of Simulation
+    :param interval_: seconds between progress messages
+    :param timeout_: seconds after which the job stops
+    :return:
+    """
+    try:
+        if job_id_ in _cancelled:
+            _queue.put((FAILED, job_id_, "Cancelled"))
+            return
+        _queue.put((RUNNING, job_id_, 0, [])) # sent first, so that a worker killed while building the run is noticed
+        start = last = time.monotonic()
+        sim = Simulation(*args_, **kwargs_)
+        # only the prices are kept, and only until they are sent
+        for snapshot in sim.iter_periods(prices_=True):
+            if time.monotonic() - last >= interval_:
+                if job_id_ in _cancelled:
+                    _queue.put((FAILED, job_id_, "Cancelled"))
+                    return
+                if time.monotonic() - start > timeout_:
+                    raise TimeoutError("The simulation took longer than {:.0f} seconds".format(timeout_))
+                _queue.put((RUNNING, job_id_, snapshot.period + 1, sim.market_prices))
+                sim.market_prices = []
+                last = time.monotonic()
+        pnl = sim.final_pnl()
+        _queue.put((RUNNING, job_id_, sim.elapsed, sim.market_prices))
+        _queue.put((DONE, job_id_, list(pnl), list(pnl.values())))
+    except Exception as e:
+        _queue.put((FAILED, job_id_, type(e).__name__ + ": " + str(e)))
+
+
+class Job:
+    """
+    Server side state of one background simulation. Prices arrive in pieces and are handed out once by
+    take_prices, the final pnl once by take_pnl, so a job does not keep the results after they were collected.
+    """
+
+    def __init__(self, job_id_, args_, kwargs_=None):
+        """
+        :param job_id_: string id of the job
+        :param args_: positional arguments of Simulation
+        :param kwargs_: keyword arguments of Simulation
+        """
+        self.job_id = job_id_
+        self.args = args_
+        self.kwargs = kwargs_ or {}
+        self.length = args_[0]
+        self.status = PENDING
+        self.periods = 0 # finished periods
+        self.error = None
+        self.submitted = time.monotonic()
+        self.seen = None # time of the last message from the worker
+        self.lock = threading.Lock()
+        self._prices = []
+        self._pnl = None
+
+    def receive(self, periods_, prices_):
+        with self.lock:
+            if self.finished():
+                return
+            self.status = RUNNING
+            self.periods = periods_
+            self.seen = time.monotonic()
+            self._prices.extend(prices_)
+
+    def finish(self, traders_, pnl_):
+        with self.lock:
+            if self.finished():
+                return
+            self._pnl = (traders_, pnl_)
+            self.status = DONE
+
+    def fail(self, error_):
+        """
+        Marks the job as failed unless it has already finished
+        :param error_: message shown to the user
+        :return: True if the job was failed now
+        """
+        with self.lock:
+            if self.finished():
+                return False
+            self.error = error_
+            self.status = FAILED
+            return True
+
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    def progress(self):
+        """
+        Returns the share of finished periods
+        :return: float between 0 and 1
+        """
+        return self.periods / self.length if self.length else 1.0
+
+    def take_prices(self):
+        """
+        Market prices received since the last call
+        :return: list of prices
+        """
+        with self.lock:
+            prices, self._prices = self._prices, []
+            return prices
+
+    def take_pnl(self):
+        """
+        Final pnl of a finished job, once
+        :return: tuple of lists (trader ids, pnl), None if the job is not done or the pnl was taken
+        """
+        with self.lock:
+            pnl, self._pnl = self._pnl, None
+            return pnl
+
+
+class JobManager:
+    """
+    Runs simulations on a pool of worker processes so that a web request only submits a run and returns its id.
+    At most max_pending_ jobs wait or run at a time, further jobs fail right away. Jobs live in the memory of the
+    server process (so the app runs a single server process), the oldest finished jobs are dropped beyond keep_.
+    """
+
+    def __init__(self, workers_=2, keep_=32, max_pending_=8, interval_=0.25, timeout_=300.0, stall_=60.0):
+        """
+        :param workers_: number of simulations that run at the same time
+        :param keep_: number of finished jobs that are kept for polling
+        :param max_pending_: number of jobs that may wait or run
+        :param interval_: seconds between progress messages of a running job
+        :param timeout_: seconds a job may run
+        :param stall_: seconds without a message after which a running job is considered lost
+        """
+        self.workers = workers_
+        self.keep = keep_
+        self.max_pending = max_pending_
+        self.interval = interval_
+        self.timeout = timeout_
+        self.stall = stall_
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+        self.pool = None
+        self.queue = None
+        self.manager = None
+        self.cancelled = None
+
+    def start(self):
+        """
+        Starts the worker processes and the collector thread, done by the first submit
+        :return:
+        """
+        # queue and cancelled ids live in a manager process, a worker killed while writing cannot leave a lock held
+        self.manager = multiprocessing.Manager()
+        self.queue = self.manager.Queue()
+        self.cancelled = self.manager.dict()
+        self.pool = multiprocessing.Pool(self.workers, initializer=_init_worker, initargs=(self.queue,
+                                                                                          self.cancelled))
+        threading.Thread(target=self.collect, daemon=True).start()
+
+    def collect(self):
+        checked = time.monotonic()
+        while True:
+            try:
+                message = self.queue.get(timeout=self.interval)
+            except queue.Empty:
+                message = ()
+            if message is None:
+                return
+            if time.monotonic() - checked >= self.interval:
+                self.check()
+                checked = time.monotonic()
+            if not message:
+                continue
+
+            status, job_id = message[0], message[1]
+            if status != RUNNING:
+                # the worker is done with the job
+                self.cancelled.pop(job_id, None)
+            job = self.get(job_id)
+            if job is None:
+                continue
+            if status == RUNNING:
+                job.receive(message[2], message[3])
+            elif status == DONE:
+                job.finish(message[2], message[3])
+            else:
+                job.fail(message[2])
+
+    def check(self):
+        """
+        Fails running jobs that are past their timeout or whose worker stopped sending messages
+        :return:
+        """
+        now = time.monotonic()
+        with self.lock:
+            running = [job for job in self.jobs.values() if job.status == RUNNING]
+        for job in running:
+            if now - job.seen > self.stall:
+                self.cancel(job.job_id, "The simulation stopped responding")
+            elif now - job.submitted > self.timeout + self.stall:
+                self.cancel(job.job_id, "The simulation took longer than {:.0f} seconds".format(self.timeout))
+
+    def submit(self, args_, kwargs_=None, replaces_=None):
+        """
+        Queues a simulation
+        :param args_: positional arguments of Simulation
+        :param kwargs_: keyword arguments of Simulation
+        :param replaces_: id of a previous job of the same page, cancelled if it has not finished
+        :return: string id of the job
+        """
+        job = Job(uuid.uuid4().hex, args_, kwargs_)
+        with self.lock:
+            if self.pool is None:
+                self.start()
+        if replaces_ is not None:
+            self.cancel(replaces_)
+        with self.lock:
+            pending = sum(not j.finished() for j in self.jobs.values())
+            self.jobs[job.job_id] = job
+            self.evict()
+        if pending >= self.max_pending:
+            job.fail("Too many simulations are running, try again later")
+        else:
+            self.pool.apply_async(_run_job, (job.job_id, job.args, job.kwargs, self.interval, self.timeout),
+                                  error_callback=lambda e: job.fail(type(e).__name__ + ": " + str(e)))
+        return job.job_id
+
+    def cancel(self, job_id_, error_="Cancelled"):
+        """
+        Fails a job that has not finished and tells its worker to stop
+        :param job_id_: string id of the job
+        :param error_: message of the failed job
+        :return:
+        """
+        job = self.get(job_id_)
+        if job is not None and job.fail(error_):
+            self.cancelled[job_id_] = True
+
+    def get(self, job_id_):
+        """
+        :param job_id_: string id of the job
+        :return: Job, None if the id is unknown or the job was dropped
+        """
+        with self.lock:
+            return self.jobs.get(job_id_)
+
+    def evict(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished()]
+        for job_id in finished[:max(len(finished) - self.keep, 0)]:
+            del self.jobs[job_id]
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.queue.put(None)
+            self.pool.terminate()
+            self.manager.shutdown()
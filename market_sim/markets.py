@@ -1,378 +1,452 @@
 import bisect
+import heapq
+from collections import deque, namedtuple
+
+from . import events
+
+
+# order types and sides
+LIMIT = 0
+MARKET = 1
+BUY = 1
+SELL = -1
+
+ORDER_TYPES = {LIMIT: LIMIT, MARKET: MARKET, "limit": LIMIT, "market": MARKET}
 
 
 class Order:
+    __slots__ = ("order_type", "trader_id", "quantity", "limit_price", "side", "order_id")
+
     def __init__(self, order_type_, trader_id_, quantity_, limit_price_ = None):
+        self.reset(order_type_, trader_id_, quantity_, limit_price_)
+
+    def reset(self, order_type_, trader_id_, quantity_, limit_price_ = None):
+        """
+        Sets all fields, used by the constructor and by OrderPool to recycle an instance
+        :param order_type_: LIMIT or MARKET ("limit" and "market" are accepted as well)
+        :param trader_id_: string id of the trader
+        :param quantity_: signed quantity, positive to buy and negative to sell
+        :param limit_price_: limit price, required for limit orders
+        :return:
+        """
         self.order_type = self._get_type(order_type_)
         self.trader_id = trader_id_
         self.quantity = quantity_
         self.limit_price = self._check_limit_price(limit_price_)
+        self.side = BUY if quantity_ > 0 else SELL
+        self.order_id = None  # assigned by the OrderBook
     
     def _get_type(self, order_type_):
-        if (order_type_ != "limit") and (order_type_ != "market"):
+        try:
+            return ORDER_TYPES[order_type_]
+        except KeyError:
             raise Exception("Unknown Order Type")
-        else:
-            return order_type_
     
     def _check_limit_price(self, limit_price_):
-        if (limit_price_ is None) and (self.order_type == "limit"):
-            raise Exception("Limit Price cannot be None for Limit Orders")
-        elif (limit_price_ is not None) and (self.order_type == "limit"):
+        if self.order_type == LIMIT:
+            if limit_price_ is None:
+                raise Exception("Limit Price cannot be None for Limit Orders")
             return limit_price_
-        
+
+
+class OrderPool:
+    """
+    Free list of Order instances. The OrderBook releases orders once they have left the book
+    (filled, rejected or market orders), acquire hands them out again instead of allocating.
+    A pool with capacity 0 never keeps an order and simply allocates.
+    """
+    def __init__(self, capacity_=100000):
+        self.capacity = capacity_
+        self._free = []
+
+    def acquire(self, order_type_, trader_id_, quantity_, limit_price_=None):
+        if self._free:
+            order = self._free.pop()
+            order.reset(order_type_, trader_id_, quantity_, limit_price_)
+            return order
+        return Order(order_type_, trader_id_, quantity_, limit_price_)
+
+    def release(self, order_):
+        if len(self._free) < self.capacity:
+            self._free.append(order_)
+
+
+NO_POOL = OrderPool(0)
+
+
+class PriceLevels:
+    """
+    Index of the active price levels of one side of the book.
+    Levels are kept in a heap with lazy deletion: insert, remove and best price are O(log n) amortized.
+    Once top was called, the n best levels are kept up to date as well, so a depth snapshot per order does not scan
+    all levels. top_version counts the changes of that set.
+    """
+    def __init__(self, highest_first_=False):
+        self._sign = -1 if highest_first_ else 1
+        self._heap = []
+        self._live = set()
+        self._top = None # sort keys (sign * price) of the best _top_n levels, ascending, None until top is called
+        self._top_n = 0
+        self.top_version = 0
+
+    def __contains__(self, price_):
+        return price_ in self._live
+
+    def __len__(self):
+        return len(self._live)
+
+    def __bool__(self):
+        return bool(self._live)
+
+    def __iter__(self):
+        return iter(sorted(self._live, reverse=self._sign < 0))
+
+    def add(self, price_):
+        """
+        Adds a price level, adding an existing level is a no-op
+        :param price_: limit price of the level
+        :return:
+        """
+        if price_ in self._live:
+            return
+        self._live.add(price_)
+        key = self._sign * price_
+        heapq.heappush(self._heap, key)
+        top = self._top
+        if top is not None and (len(top) < self._top_n or top and key < top[-1]):
+            bisect.insort(top, key)
+            if len(top) > self._top_n:
+                top.pop()
+            self.top_version += 1
+
+    def remove(self, price_):
+        """
+        Removes a price level, the heap entry is dropped lazily
+        :param price_: limit price of the level
+        :return:
+        """
+        self._live.remove(price_)
+        top = self._top
+        if top and self._sign * price_ <= top[-1]:
+            top.remove(self._sign * price_)
+            if len(self._live) > len(top):
+                # the next best level is not known, top finds it again
+                self._top = None
+            self.top_version += 1
+        if len(self._heap) > 2 * len(self._live) + 32:
+            self._heap = [self._sign * p for p in self._live]
+            heapq.heapify(self._heap)
+
+    def best(self):
+        """
+        Returns the best price level (lowest, or highest if highest_first_)
+        :return: float price
+        """
+        heap = self._heap
+        while self._sign * heap[0] not in self._live:
+            heapq.heappop(heap)
+        return self._sign * heap[0]
+
+    def top(self, n_):
+        """
+        Returns the n_ best price levels, best first
+        :param n_: number of levels
+        :return: list of float prices
+        """
+        if self._top is None or n_ != self._top_n:
+            self._top = [self._sign * p for p in (heapq.nlargest(n_, self._live) if self._sign < 0
+                                                   else heapq.nsmallest(n_, self._live))]
+            self._top_n = n_
+            self.top_version += 1
+        sign = self._sign
+        return [sign * key for key in self._top]
+
+
+class Fills:
+    """
+    Fills of one incoming order, kept as parallel lists of (counterparty, price, quantity).
+    Quantities are positive, the direction follows from side: the incoming trader gets side * quantity
+    and the counterparty gets -side * quantity.
+    """
+    def __init__(self, trader_id_, side_):
+        self.trader_id = trader_id_
+        self.side = side_
+        self.counterparties = []
+        self.prices = []
+        self.quantities = []
+
+    def __len__(self):
+        return len(self.prices)
+
+    def __bool__(self):
+        return bool(self.prices)
+
+    def append(self, counterparty_, price_, quantity_):
+        self.counterparties.append(counterparty_)
+        self.prices.append(price_)
+        self.quantities.append(quantity_)
+
+
+BookStatistics = namedtuple(
+    "BookStatistics", ["bid_size", "ask_size", "bid_orders", "ask_orders", "bid_levels", "ask_levels"]
+)
+
 
 class OrderBook:
     
-    def __init__(self):
+    def __init__(self, events_=events.NULL_SINK, pool_=NO_POOL):
+        self.events = events_
+        self.pool = pool_
         self.bid_book = {}
-        self.bid_book_prices = []
+        self.bid_book_prices = PriceLevels()
         self.ask_book = {}
-        self.ask_book_prices = []
-        self.bid_size = 0
-        self.ask_size = 0
+        self.ask_book_prices = PriceLevels(highest_first_=True)
+        self._bid_size = 0
+        self._ask_size = 0
+        self._bid_orders = 0
+        self._ask_orders = 0
         
         self.order = 0
         self.market_price = 0
-        self.matches = []
+        self.matches = None
+        # (side, price) of the levels the last order changed: where its remainder rests and the last level it
+        # traded at (levels swept before that were emptied), None if there is no such level
+        self.rested = None
+        self.swept = None
+        self.next_order_id = 0
         
-    def initialize(self, dir_):
-        if dir_ == "ask":
-            _dir = self.ask_book_prices
-        elif dir_ == "bid":
-            _dir =  self.bid_book_prices
-            
-        if not _dir:
-            bisect.insort(_dir, self.order.limit_price)
-
     def push(self, order_):
         self.order = order_
-        if self.order.order_type == "limit":
+        self.order.order_id = self.next_order_id
+        self.next_order_id += 1
+        if self.order.quantity == 0:
+            raise Exception("Order cannot be zero")
+        self.order.quantity = abs(self.order.quantity)
+        self.matches = Fills(self.order.trader_id, self.order.side)
+        self.rested = None
+        self.swept = None
+        if self.events.level <= events.DEBUG:
+            self.events.emit(events.DEBUG, events.Event(events.ORDER_ACCEPTED, self.order.trader_id,
+                                                        self.order.limit_price, self.order.quantity))
+        if self.order.order_type == LIMIT:
             self.process_limit_order()
-        elif self.order.order_type == "market":
-            self.process_market_order()
         else:
-            raise Exception("Unknown Order Type")
-        #self.book_keeping()
+            self.process_market_order()
+            self.pool.release(self.order)
         
     def get_market_price(self):
         return self.market_price
     
+    def get_statistics(self):
+        """
+        Aggregate size, number of orders and number of price levels of both sides,
+        maintained on every add, fill and removal
+        :return: BookStatistics
+        """
+        return BookStatistics(self._bid_size, self._ask_size, self._bid_orders, self._ask_orders,
+                              len(self.bid_book_prices), len(self.ask_book_prices))
+    
+    def get_quotes(self):
+        """
+        Best resting prices, buy orders rest in the ask book and sell orders in the bid book
+        :return: tuple (highest buy price, lowest sell price), None for an empty side
+        """
+        best_buy = self.ask_book_prices.best() if self.ask_book_prices else None
+        best_sell = self.bid_book_prices.best() if self.bid_book_prices else None
+        return best_buy, best_sell
+    
+    def get_depth(self, n_):
+        """
+        Level 2 view of the n_ best levels of both sides, buy orders rest in the ask book and sell orders in the bid book
+        :param n_: number of levels per side
+        :return: tuple of lists (buy levels, sell levels) of (price, size, number of orders), best first
+        """
+        buy = [(price, self.ask_book[price]["size"], self.ask_book[price]["number_orders"])
+               for price in self.ask_book_prices.top(n_)]
+        sell = [(price, self.bid_book[price]["size"], self.bid_book[price]["number_orders"])
+                for price in self.bid_book_prices.top(n_)]
+        return buy, sell
+    
     def process_limit_order(self):
-        if self.order.quantity > 0.0:
-            self.order.quantity = abs(self.order.quantity)
-            self.initialize("ask")
+        if self.order.side == BUY:
             self.add_to_ask_book()
-        
-        elif self.order.quantity < 0.0:
-            self.order.quantity = abs(self.order.quantity)
-            self.initialize("bid")
-            self.add_to_bid_book()
         else:
-            raise Exception("Order cannot be zero")
+            self.add_to_bid_book()
         
     def add_to_ask_book(self):
-            
-        if self.bid_book_prices and (self.order.limit_price >= self.bid_book_prices[0]):
-            self.match_limit_ask()
-        else:
+        quantity = self.sweep(self.bid_book, self.bid_book_prices, self.order.quantity, self.order.limit_price)
+        if quantity > 0:
+            self.order.quantity = quantity
             self.update_ask_book()
+            if self.matches:
+                self.emit_order_event(events.PARTIAL_FILL)
+        else:
+            self.emit_order_event(events.FILL)
+            self.pool.release(self.order)
     
     def add_to_bid_book(self):
-            
-        if self.ask_book_prices and (self.order.limit_price <= self.ask_book_prices[-1]):
-            self.match_limit_bid()
-        else:
+        quantity = self.sweep(self.ask_book, self.ask_book_prices, self.order.quantity, self.order.limit_price)
+        if quantity > 0:
+            self.order.quantity = quantity
             self.update_bid_book()
+            if self.matches:
+                self.emit_order_event(events.PARTIAL_FILL)
+        else:
+            self.emit_order_event(events.FILL)
+            self.pool.release(self.order)
     
     def update_ask_book(self):
+        self.rested = (BUY, self.order.limit_price)
+        self._ask_size += self.order.quantity
+        self._ask_orders += 1
         if self.order.limit_price in self.ask_book:
             self.ask_book[self.order.limit_price]["number_orders"] += 1
             self.ask_book[self.order.limit_price]["size"] += self.order.quantity
-            self.ask_book[self.order.limit_price]["orders"][self.order.trader_id] = self.order
+            self.ask_book[self.order.limit_price]["orders"].append(self.order)
 
         else:
-            if not self.order.limit_price in self.ask_book_prices:
-                bisect.insort(self.ask_book_prices, self.order.limit_price)
+            self.ask_book_prices.add(self.order.limit_price)
             self.ask_book[self.order.limit_price] = {
                 "number_orders": 1,
                 "size": self.order.quantity,
-                "orders": {self.order.trader_id: self.order},
+                "orders": deque([self.order]),
             }
 
     def update_bid_book(self):
+        self.rested = (SELL, self.order.limit_price)
+        self._bid_size += self.order.quantity
+        self._bid_orders += 1
         if self.order.limit_price in self.bid_book:
             self.bid_book[self.order.limit_price]["number_orders"] += 1
             self.bid_book[self.order.limit_price]["size"] += self.order.quantity
-            self.bid_book[self.order.limit_price]["orders"][self.order.trader_id] = self.order
+            self.bid_book[self.order.limit_price]["orders"].append(self.order)
 
         else:
-            if not self.order.limit_price in self.bid_book_prices:
-                bisect.insort(self.bid_book_prices, self.order.limit_price)
+            self.bid_book_prices.add(self.order.limit_price)
             self.bid_book[self.order.limit_price] = {
                 "number_orders": 1,
                 "size": self.order.quantity,
-                "orders": {self.order.trader_id: self.order},
+                "orders": deque([self.order]),
             }
     
     ########################
-    def match_handler(self, trader_id_, price_, quantity_):
-        self.market_price = price_
-        print(str(trader_id_) + " gets " + str(quantity_) + " at " + str(price_))
-        
-        match = {trader_id_: (price_, quantity_)}
-        self.matches.append(match)
-    
-    def clear_matches(self):
-        self.matches = []
-    
-    def remove_bid_order_price(self, strike_):
-        self.bid_book_prices.remove(strike_)
-        self.bid_book.pop(strike_)
-    
-    def remove_bid_order(self, strike_, ask_quantity_,bid_trader_id_):
-        self.bid_book[strike_]["number_orders"] -= 1
-        self.bid_book[strike_]["size"] -= ask_quantity_
-        self.bid_book[strike_]['orders'].pop(bid_trader_id_)
-            
-    def update_bid_order(self, strike_, ask_quantity_):
-        
-        if not self.bid_book[strike_]['orders'] or (self.bid_book[strike_]['number_orders'] == 0):
-            self.remove_bid_order_price(strike_)
-            return ask_quantity_
-        
-        bid_trader_id = list(self.bid_book[strike_]['orders'])[0]
-        bid_order = list(self.bid_book[strike_]['orders'].values())[0]
-        diff = ask_quantity_ - bid_order.quantity
-        
-        print(diff)
-        if diff > 0:
-            self.match_handler(bid_trader_id, strike_, -bid_order.quantity) # seller gets this
-            self.match_handler(self.order.trader_id, strike_, bid_order.quantity) # buyer gets this
-            self.remove_bid_order(strike_, bid_order.quantity, bid_trader_id)
-            return self.update_bid_order(strike_, diff)
-        
-        if diff == 0:
-            self.remove_bid_order_price(strike_)
-            self.match_handler(bid_trader_id, strike_, -bid_order.quantity) # seller gets this
-            self.match_handler(self.order.trader_id, strike_, bid_order.quantity) #
-            
-            return 0
+    def sweep(self, book_, prices_, quantity_, limit_price_=None):
+        """
+        Matches the incoming order against one side of the book in a single pass,
+        best price level first and in time priority within a level
+        :param book_: resting side, bid_book or ask_book
+        :param prices_: PriceLevels of the resting side
+        :param quantity_: unsigned quantity of the incoming order
+        :param limit_price_: limit price of the incoming order, None for market orders
+        :return: unfilled quantity
+        """
+        fills = self.matches
+        side = fills.side
+        traded = 0
+        filled_orders = 0
+        trace = self.events.level <= events.DEBUG
         
-        if diff < 0:
-            print("HERE " + str(ask_quantity_))
-            self.match_handler(bid_trader_id, strike_, -abs(ask_quantity_)) # seller gets this
-            self.match_handler(self.order.trader_id, strike_, abs(ask_quantity_))
+        while quantity_ > 0 and prices_:
+            strike = prices_.best()
+            if (limit_price_ is not None) and ((strike - limit_price_) * side > 0): # order doesn_t fill!
+                break
             
-            self.bid_book[strike_]['orders'][bid_trader_id].quantity = abs(diff)
-            self.bid_book[strike_]["size"] = abs(diff)
-            print(self.bid_book[strike_]['orders'][bid_trader_id].quantity)
+            level = book_[strike]
+            orders = level["orders"]
+            while quantity_ > 0 and orders:
+                resting = orders[0]
+                quantity = min(quantity_, resting.quantity)
+                fills.append(resting.trader_id, strike, quantity)
+                if trace:
+                    self.events.emit(events.DEBUG, events.Event(events.TRADE, resting.trader_id, strike, -side * quantity))
+                quantity_ -= quantity
+                traded += quantity
+                level["size"] -= quantity
+                if quantity == resting.quantity:
+                    orders.popleft()
+                    level["number_orders"] -= 1
+                    filled_orders += 1
+                    self.pool.release(resting)
+                else:
+                    resting.quantity -= quantity
             
-            return 0
-          
-    def match_limit_ask(self):
+            if not orders:
+                prices_.remove(strike)
+                book_.pop(strike)
         
-        ask_quantity = self.order.quantity
+        if book_ is self.bid_book:
+            self._bid_size -= traded
+            self._bid_orders -= filled_orders
+        else:
+            self._ask_size -= traded
+            self._ask_orders -= filled_orders
         
-        while ask_quantity > 0:
-            
-            if not self.bid_book_prices: # no orders to match
-                self.order.quantity = ask_quantity
-                self.update_ask_book()
-                print("Order partially filled")
-                break
-                
-            strike = self.bid_book_prices[0]
-            
-            if (self.order.limit_price < strike): # order doesn_t fill!
-                self.order.quantity = ask_quantity
-                self.update_ask_book()
-                print("Order partially filled")
-                break
-            
-            if self.order.limit_price >= strike:
-                ask_quantity = self.update_bid_order(strike, ask_quantity)
-            
-            if ask_quantity == 0:
-                self.clean_prices()
-                print("Order Filled!")
-                break
-                
-            print(ask_quantity)
-            
-    ##############################
+        if fills:
+            self.market_price = fills.prices[-1]
+            self.swept = (-side, self.market_price)
+        return quantity_
     
-    def remove_ask_order_price(self, strike_):
-        self.ask_book_prices.remove(strike_)
-        self.ask_book.pop(strike_)
+    def emit_order_event(self, kind_):
+        """
+        Emits an INFO event about the incoming order, the event is only built if the sink listens
+        :param kind_: event type
+        :return:
+        """
+        if self.events.level <= events.INFO:
+            self.events.emit(events.INFO, events.Event(kind_, self.order.trader_id, self.order.limit_price,
+                                                       self.order.quantity))
+    
+    def clear_matches(self):
+        self.matches = None
     
-    def remove_ask_order(self, strike_, bid_quantity_, ask_trader_id_):
-        self.ask_book[strike_]["number_orders"] -= 1
-        self.ask_book[strike_]["size"] -= bid_quantity_
-        self.ask_book[strike_]['orders'].pop(ask_trader_id_)
-          
-    def update_ask_order(self, strike_, bid_quantity_):
-        print(self.ask_book)
-        print(strike_)
-        if not self.ask_book[strike_]['orders'] or self.ask_book[strike_]['size'] == 0:
-            self.remove_ask_order_price(strike_)
-            return bid_quantity_
-        
-        ask_trader_id = list(self.ask_book[strike_]['orders'])[0]
-        ask_order = list(self.ask_book[strike_]['orders'].values())[0]
-        diff = bid_quantity_ - ask_order.quantity
-        
-        print(diff)
-        
-        if diff > 0:
-            self.match_handler(ask_trader_id, strike_, -ask_order.quantity) # seller gets this
-            self.match_handler(self.order.trader_id, strike_, ask_order.quantity) # buyer gets this
-            self.remove_ask_order(strike_, ask_order.quantity, ask_trader_id)
-            return self.update_ask_order(strike_, diff)
-        
-        if diff == 0:
-            self.remove_ask_order_price(strike_)
-            self.match_handler(ask_trader_id, strike_, -ask_order.quantity) # seller gets this
-            self.match_handler(self.order.trader_id, strike_, ask_order.quantity) #
-            
-            return 0
-        
-        if diff < 0:
-            print("HERE " + str(bid_quantity_))
-            self.match_handler(ask_trader_id, strike_, -abs(bid_quantity_)) # seller gets this
-            self.match_handler(self.order.trader_id, strike_, abs(bid_quantity_))
-            
-            self.ask_book[strike_]['orders'][ask_trader_id].quantity = abs(diff) 
-            self.ask_book[strike_]["size"] = abs(diff) 
-            print(self.ask_book[strike_]['orders'][ask_trader_id].quantity)
-            
-            return 0    
-        
-    def match_limit_bid(self):
-        
-        bid_quantity = self.order.quantity
-        
-        while bid_quantity > 0:
-            
-            if not self.ask_book_prices: # no orders to match
-                self.order.quantity = bid_quantity
-                self.update_bid_book()
-                print("Order partially filled or no match")
-                break
-                
-            strike = self.ask_book_prices[-1]
-            
-            if (self.order.limit_price > strike): # order doesn_t fill!
-                self.order.quantity = bid_quantity
-                print("this is " + str(bid_quantity))
-                self.update_bid_book()
-                print("Order partially filled")
-                break
-            
-            if self.order.limit_price <= strike:
-                bid_quantity = self.update_ask_order(strike, bid_quantity)
-            
-            if bid_quantity == 0:
-                self.clean_prices()
-                print("Order Filled!")
-                break
     #####################################
 
     def process_market_order(self):
-        self.book_keeping()
-        if self.order.quantity > 0.0:
-            self.order.quantity = abs(self.order.quantity)
+        if self.order.side == BUY:
 
             if not self.bid_book_prices:
-                print("WHAT")
+                self.emit_order_event(events.REJECTED)
                 return
             else:
                 self.match_market_ask()
 
-        elif self.order.quantity < 0.0:
-            self.order.quantity = abs(self.order.quantity)
+        else:
 
             if not self.ask_book_prices:
-                print("WHAT")
+                self.emit_order_event(events.REJECTED)
                 return
             else:
                 self.match_market_bid()
-        else:
-            raise Exception("Order cannot be zero")
-
-    def get_bid_size(self):
-        self.bid_size = 0
-        for key, value in self.bid_book.items():
-            self.bid_size += value["size"]
-
-    def get_ask_size(self):
-        self.ask_size = 0
-        for key, value in self.ask_book.items():
-            self.ask_size += value["size"]
 
     def match_market_ask(self):
-
-        ask_quantity = self.order.quantity
         
-        if ask_quantity > self.bid_size:
+        if self.order.quantity > self._bid_size:
+            self.emit_order_event(events.REJECTED)
             return
-
-        while ask_quantity > 0:
-
-            strike = self.bid_book_prices[0]
-            ask_quantity = self.update_bid_order(strike, ask_quantity)
-            if ask_quantity == 0:
-                print("Order Filled!")
-                break
+        
+        self.sweep(self.bid_book, self.bid_book_prices, self.order.quantity)
+        self.emit_order_event(events.FILL)
 
     def match_market_bid(self):
-
-        bid_quantity = self.order.quantity
         
-        if bid_quantity > self.ask_size:
+        if self.order.quantity > self._ask_size:
+            self.emit_order_event(events.REJECTED)
             return
-
-        while bid_quantity > 0:
-
-            strike = self.ask_book_prices[-1]
-            bid_quantity = self.update_ask_order(strike, bid_quantity)
-            if bid_quantity == 0:
-                print("Order Filled!")
-                break
-                
-    def clean_prices(self):
         
-        for key in self.ask_book_prices:
-            if key not in self.ask_book:
-                self.ask_book_prices.remove(key)
-        
-        for key in self.bid_book_prices:
-            if key not in self.bid_book:
-                self.bid_book_prices.remove(key)
-    
-    def get_bid_size(self):
-        self.bid_size = 0
-        for key, value in self.bid_book.items():
-            self.bid_size += value["size"]
-
-    def get_ask_size(self):
-        self.ask_size = 0
-        for key, value in self.ask_book.items():
-            self.ask_size += value["size"]
-    
-    def book_keeping(self):
-        self.get_bid_size()
-        self.get_ask_size()
+        self.sweep(self.ask_book, self.ask_book_prices, self.order.quantity)
+        self.emit_order_event(events.FILL)
         
 #############################################
 
 
 class Market(object):
     
-    def __init__(self, initial_market_price_):
-        self.orderbook = OrderBook()
+    def __init__(self, initial_market_price_, events_=events.NULL_SINK, pool_=NO_POOL):
+        self.events = events_
+        self.orderbook = OrderBook(events_, pool_)
         self.market_price = initial_market_price_
         self.initial_market_price = initial_market_price_
-        self.matches = [] # list of dictionaries!
+        self.matches = None # Fills of the last order
     
     def push(self, order_):
         # update traders and push state back to the trader - 
@@ -380,7 +454,8 @@ class Market(object):
         
         self.orderbook.push(order_)
         self.market_price = self.get_market_price()
-        print("Market price is " + str(self.market_price))
+        if self.events.level <= events.DEBUG:
+            self.events.emit(events.DEBUG, events.Event(events.PRICE, order_.trader_id, self.market_price, None))
         self.matches = self.orderbook.matches # get matches here
         self.orderbook.clear_matches()
         
@@ -390,4 +465,3 @@ class Market(object):
         else:
             return self.orderbook.get_market_price()
         
-
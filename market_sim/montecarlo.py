@@ -0,0 +1,73 @@
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .simulation import Simulation
+
+
+def _run_replication(task_):
+    """
+    Runs one replication in a worker and writes its price path and final pnl into the shared arrays
+    :param task_: tuple (index, seed sequence, simulation arguments, simulation keyword arguments, shared arrays)
+    :return: index of the replication
+    """
+    index, seed, args, kwargs, shared = task_
+
+    sim = Simulation(*args, seed_=seed, **kwargs)
+    sim.start()
+
+    for values, (name, shape) in zip((sim.market_prices, sim.pnl_df["PNL"]), shared):
+        shm = shared_memory.SharedMemory(name=name)
+        np.ndarray(shape, dtype=np.float64, buffer=shm.buf)[index] = values
+        shm.close()
+    return index
+
+
+class MonteCarlo:
+    """
+    Runs independent replications of one Simulation configuration over a process pool.
+    Every replication draws from its own random stream spawned from one seed, price paths and final pnl vectors
+    are written by the workers into shared memory and stacked into (replications, ...) arrays.
+    """
+
+    def __init__(self, replications_, length_, num_fund_, num_chart_, fund_dist_, chart_dist_, seed_=None,
+                 processes_=None, **kwargs):
+        """
+        :param replications_: number of replications
+        :param seed_: seed of the root SeedSequence, None for fresh entropy
+        :param processes_: number of worker processes, defaults to the number of cores
+        :param kwargs: further keyword arguments of Simulation
+        """
+        self.replications = replications_
+        self.args = (length_, num_fund_, num_chart_, fund_dist_, chart_dist_)
+        self.kwargs = kwargs
+        self.seed = np.random.SeedSequence(seed_)
+        self.processes = processes_ or multiprocessing.cpu_count()
+
+        self.num_traders = num_fund_ + num_chart_
+        self.market_prices = None
+        self.pnl = None
+
+    def start(self):
+        shapes = [(self.replications, self.args[0] * self.num_traders), (self.replications, self.num_traders)]
+        blocks = [shared_memory.SharedMemory(create=True, size=max(8 * int(np.prod(shape)), 1)) for shape in shapes]
+        try:
+            shared = [(shm.name, shape) for shm, shape in zip(blocks, shapes)]
+            tasks = [(i, seed, self.args, self.kwargs, shared)
+                     for i, seed in enumerate(self.seed.spawn(self.replications))]
+
+            if self.processes == 1:
+                for task in tasks:
+                    _run_replication(task)
+            else:
+                with multiprocessing.Pool(min(self.processes, self.replications)) as pool:
+                    for _ in pool.imap_unordered(_run_replication, tasks):
+                        pass
+
+            self.market_prices, self.pnl = [np.ndarray(shape, dtype=np.float64, buffer=shm.buf).copy()
+                                            for shm, shape in zip(blocks, shapes)]
+        finally:
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
@@ -1,5 +1,6 @@
 from .pnl import PnL
-from .markets import Order
+from .markets import LIMIT, MARKET, NO_POOL
+from . import events
 
 
 class PortfolioManager:
@@ -8,11 +9,14 @@ class PortfolioManager:
     It checks if an order is valid with the given parameters
     ...
     """
-    def __init__(self, cash_, stock_, margin_, trader_id_):
+    def __init__(self, cash_, stock_, margin_, trader_id_, events_=events.NULL_SINK, pool_=NO_POOL):
+        self.events = events_
+        self.pool = pool_
         self.cash = cash_
         self.stock = stock_
         self.margin = margin_
         self.trader_id = trader_id_
+        self.order_type = self._get_order_type()
         self.pnl = self.initialize_pnl()
         self.amount = 0.0
         
@@ -22,6 +26,16 @@ class PortfolioManager:
         self.market_price = 0.0
         self.position = 0.0
         
+    def _get_order_type(self):
+        """
+        Fundamentalists submit limit orders and chartists market orders
+        :return: LIMIT, MARKET or None for unknown trader types
+        """
+        if self.trader_id.startswith("fundamentalist"):
+            return LIMIT
+        elif self.trader_id.startswith("chartist"):
+            return MARKET
+
     def initialize_pnl(self):
         t = PnL()
         t.push(0.0, self.stock)
@@ -43,7 +57,7 @@ class PortfolioManager:
         elif self.position < 0:
             self.sell()
         else:
-            print("cannot be zero")
+            self.reject()
             return
 
     def _get_amount(self):
@@ -66,6 +80,18 @@ class PortfolioManager:
             #self.outstanding_cash += (quantity_ * price_)
             self.outstanding_stock += quantity_
 
+    def update_fills(self, side_, prices_, quantities_):
+        """
+        Receives all fills of one order, same as update for every fill
+        :param side_: BUY or SELL
+        :param prices_: fill prices
+        :param quantities_: unsigned fill quantities
+        :return:
+        """
+        update = self.update
+        for price, quantity in zip(prices_, quantities_):
+            update(price, side_ * quantity)
+
     def buy(self):
         # check if cash is available
         self._get_amount()
@@ -74,7 +100,7 @@ class PortfolioManager:
             self.outstanding_cash += self.amount*self.market_price
             
         else:
-            print("order cannot be processed")
+            self.reject()
             self.amount = 0
 
     def sell(self):
@@ -84,20 +110,28 @@ class PortfolioManager:
         if self.stock >= (self.outstanding_stock - self.amount):
             self.outstanding_stock -= self.amount
         else:
-            print("order cannot be processed")
+            self.reject()
             self.amount = 0
     
+    def reject(self):
+        """
+        Reports an order that cannot be processed
+        :return:
+        """
+        if self.events.level <= events.INFO:
+            self.events.emit(events.INFO, events.Event(events.REJECTED, self.trader_id, self.market_price, self.amount))
+
     def update_market_price(self, market_price_):
         self.pnl.push(market_price_, 0.0)
         
     def create_order(self, value):
         if self.amount != 0:
-            if self.trader_id.startswith("fundamentalist"):
-                return Order("limit", self.trader_id, self.amount, value)
-            elif self.trader_id.startswith("chartist"):
-                return Order("market", self.trader_id, self.amount)
+            if self.order_type == LIMIT:
+                return self.pool.acquire(LIMIT, self.trader_id, self.amount, value)
+            elif self.order_type == MARKET:
+                return self.pool.acquire(MARKET, self.trader_id, self.amount)
             else:
-                print("unknown trader type")
+                self.reject()
         else:
             return
 
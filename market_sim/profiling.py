@@ -0,0 +1,137 @@
+import time
+
+from .markets import MARKET
+
+PHASES = ("signal", "matching", "fills", "create_dfs")
+
+
+def call(function_, *args):
+    """
+    Unprofiled counterpart of PhaseTimer
+    """
+    return function_(*args)
+
+
+class Profile:
+    """
+    Timers and counters of one Simulation run, filled through the phase callables that Simulation selects when
+    it is profiled. Times are taken with the monotonic time.perf_counter. The signal phase covers the traders'
+    decisions including building their orders, matching is Market.push and fills is process_matches (portfolio
+    updates and the tape).
+    """
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.total = 0.0
+        self.trader_steps = 0 # every trader acts once per period, with or without an order
+        self.orders = {"limit": 0, "market": 0}
+        self.filled = 0 # incoming orders filled completely
+        self.partially_filled = 0
+        self.resting = 0 # limit orders that went to the book, with or without fills
+        self.rejected = 0 # market orders without any fill
+        self.fills = 0
+        self.volume = 0
+        # high-water marks of the book, buy orders rest in the ask book and sell orders in the bid book
+        self.book = {"buy_size": 0, "sell_size": 0, "buy_orders": 0, "sell_orders": 0, "buy_levels": 0,
+                     "sell_levels": 0}
+        self.fills_per_period = []
+
+    def count_order(self, market_, quantity_, fills_, statistics_):
+        """
+        Counts an incoming order after it was matched
+        :param market_: True for a market order
+        :param quantity_: unsigned quantity of the order
+        :param fills_: Fills of the order
+        :param statistics_: BookStatistics after the order
+        :return:
+        """
+        self.orders["market" if market_ else "limit"] += 1
+        filled = sum(fills_.quantities)
+        self.fills += len(fills_)
+        self.volume += filled
+        if filled == quantity_:
+            self.filled += 1
+        elif filled:
+            self.partially_filled += 1
+        if market_ and not filled:
+            self.rejected += 1
+        if not market_ and filled < quantity_:
+            self.resting += 1
+
+        book = self.book
+        book["buy_size"] = max(book["buy_size"], statistics_.ask_size)
+        book["sell_size"] = max(book["sell_size"], statistics_.bid_size)
+        book["buy_orders"] = max(book["buy_orders"], statistics_.ask_orders)
+        book["sell_orders"] = max(book["sell_orders"], statistics_.bid_orders)
+        book["buy_levels"] = max(book["buy_levels"], statistics_.ask_levels)
+        book["sell_levels"] = max(book["sell_levels"], statistics_.bid_levels)
+
+    def end_period(self, traders_, trades_):
+        """
+        :param traders_: number of traders that acted in the period
+        :param trades_: number of fills in the period
+        :return:
+        """
+        self.trader_steps += traders_
+        self.fills_per_period.append(trades_)
+
+    def report(self):
+        """
+        Returns the profile as plain python types
+        :return: dict with seconds per phase, order counters, book high-water marks and fills per period
+        """
+        seconds = dict(self.seconds)
+        seconds["other"] = max(self.total - sum(self.seconds.values()), 0.0)
+        seconds["total"] = self.total
+        return {
+            "seconds": seconds,
+            "counts": {
+                "trader_steps": self.trader_steps,
+                # trader steps without an order, the trader did not trade or its order was rejected
+                "no_order": self.trader_steps - self.orders["limit"] - self.orders["market"],
+                "limit_orders": self.orders["limit"],
+                "market_orders": self.orders["market"],
+                "filled": self.filled,
+                "partially_filled": self.partially_filled,
+                "resting": self.resting,
+                "rejected": self.rejected,
+                "fills": self.fills,
+                "volume": self.volume,
+            },
+            "book": dict(self.book),
+            "fills_per_period": list(self.fills_per_period),
+        }
+
+
+class PhaseTimer:
+    """
+    Calls a function and adds its run time to a phase of a Profile
+    """
+
+    def __init__(self, profile_, phase_):
+        self.seconds = profile_.seconds
+        self.phase = phase_
+
+    def __call__(self, function_, *args):
+        start = time.perf_counter()
+        result = function_(*args)
+        self.seconds[self.phase] += time.perf_counter() - start
+        return result
+
+
+class MatchingTimer:
+    """
+    Pushes an order to a Market, timing the matching phase and counting the order in a Profile
+    """
+
+    def __init__(self, profile_, market_):
+        self.profile = profile_
+        self.market = market_
+
+    def __call__(self, order_):
+        market = order_.order_type == MARKET
+        quantity = abs(order_.quantity)
+        start = time.perf_counter()
+        self.market.push(order_)
+        self.profile.seconds["matching"] += time.perf_counter() - start
+        self.profile.count_order(market, quantity, self.market.matches, self.market.orderbook.get_statistics())
@@ -1,85 +1,291 @@
+import functools
+import time
+from collections import namedtuple
 
-from .markets import Market
+from .markets import Market, OrderPool, NO_POOL
+from . import events
+from .tape import TradeTape
+from .profiling import Profile, PhaseTimer, MatchingTimer, call
 import numpy as np
 import pandas as pd
 from .traders import *
 
+# state of the market at the end of a period, best_bid / best_ask are None while that side of the book is empty
+PeriodSnapshot = namedtuple("PeriodSnapshot", ["period", "price", "volume", "trades", "best_bid", "best_ask", "pnl"])
+
 
 class Simulation(object):
     
-    def __init__(self, length_, num_fund_, num_chart_, fund_dist_, chart_dist_):
+    def __init__(self, length_, num_fund_, num_chart_, fund_dist_, chart_dist_, events_=events.NULL_SINK,
+                 recycle_orders_=False, cohort_=None, seed_=None, depth_=None, archive_=None, profile_=False):
+        """
+        :param profile_: time the phases of every period and count orders, start then sets profile_report.
+        Off by default, the unprofiled run calls the phases directly
+        :param depth_: optional depth.DepthRecorder that snapshots the top of the book
+        :param archive_: optional archive.RunWriter that writes trades, prices and periods to disk, the caller
+        writes the final pnl with archive_.finish(sim) when the run is done
+        :param seed_: seed, SeedSequence or numpy.random.Generator, every random draw of the run goes through it
+        :param cohort_: None to simulate traders as Fundamentalist and Chartist instances, "exact" to keep the
+        fundamentalists in a FundamentalistCohort that is stepped trader by trader (same results), or "batch" to
+        keep fundamentalists and chartists in cohorts that are each stepped at once on the latest price.
+        Only "batch" moves chartists onto the shared ring buffer of ChartistCohort, with None and "exact" (and so in
+        the app) every Chartist still keeps its own RollingIndicator
+        """
         self.length = length_
+        self.rng = np.random.default_rng(seed_)
+        self.events = events_
+        self.order_pool = OrderPool() if recycle_orders_ else NO_POOL
         
         self.fund_dist = fund_dist_
         self.chart_dist = chart_dist_
         
-        self.fundamentalists = self.initialize_fundamentalists(num_fund_)
-        self.chartists = self.initialize_chartists(num_chart_)
+        self.cohort_mode = cohort_
+        self.cohorts = []
+        if cohort_ is None:
+            self.fundamentalists = self.initialize_fundamentalists(num_fund_)
+        else:
+            self.cohorts.append(self.initialize_fundamentalist_cohort(num_fund_))
+            self.fundamentalists = {}
+        if cohort_ == "batch":
+            self.cohorts.append(self.initialize_chartist_cohort(num_chart_))
+            self.chartists = {}
+        else:
+            self.chartists = self.initialize_chartists(num_chart_)
         
         self.traders = {**self.fundamentalists, **self.chartists}
+        self.cohort_members = {}
+        for cohort in self.cohorts:
+            for i, name in enumerate(cohort.trader_ids):
+                self.cohort_members[name] = (cohort, i)
+        self.trader_index = {name: i for i, name in enumerate(list(self.cohort_members) + list(self.traders))}
         
-        self.market = Market(self.fund_dist[0])
+        self.market = Market(self.fund_dist[0], self.events, self.order_pool)
         self.market_prices = []
+        self.tape = TradeTape(self.trader_index)
+        self.depth = depth_
+        self.archive = archive_
+        if archive_ is not None:
+            archive_.set_traders(self.trader_index)
+        self.period = 0
+        self.elapsed = 0 # finished periods, a restored checkpoint continues from here
+        self.record = True # keep market_prices and tape, off while streaming with iter_periods
+        self.record_prices = True # keep market_prices
+        self.period_volume = 0
+        self.period_trades = 0
+        
+        # the phases of a period, timed and counted when profiling
+        self.profile = Profile() if profile_ else None
+        if self.profile is None:
+            self.signal = call
+            self.match = self.market.push
+            self.fill = self.process_matches
+        else:
+            self.signal = PhaseTimer(self.profile, "signal")
+            self.match = MatchingTimer(self.profile, self.market)
+            self.fill = functools.partial(PhaseTimer(self.profile, "fills"), self.process_matches)
         
         self.market_prices_df = None
         self.pnl_df = None
+        self.profile_report = None
+    
+    def draw_population(self, dist_, num_):
+        """
+        Draws the valuations or windows of a population in one call
+        :param dist_: tuple (mean, standard deviation) of the normal distribution
+        :param num_: number of traders
+        :return: list of non-negative ints
+        """
+        return np.abs(self.rng.normal(*dist_, size=num_).astype(np.int64)).tolist()
     
     def initialize_fundamentalists(self, num_):
         fundamentalists = {}
-        t = 1
         
-        for i in range(num_):
-            value = abs(int(np.random.normal(*self.fund_dist)))
+        for t, value in enumerate(self.draw_population(self.fund_dist, num_), 1):
             trader_id = "fundamentalist_" + str(t)
-            fundamentalists[str(trader_id)] = Fundamentalist(value, trader_id)
-            t += 1
+            fundamentalists[trader_id] = Fundamentalist(value, trader_id, self.events, self.order_pool)
         return fundamentalists
         
+    def initialize_fundamentalist_cohort(self, num_):
+        values = self.draw_population(self.fund_dist, num_)
+        trader_ids = ["fundamentalist_" + str(t) for t in range(1, num_ + 1)]
+        return FundamentalistCohort(values, trader_ids, self.events, self.order_pool)
+        
+    def initialize_chartist_cohort(self, num_):
+        windows = self.draw_population(self.chart_dist, num_)
+        trader_ids = ["chartist_" + str(t) for t in range(1, num_ + 1)]
+        return ChartistCohort(windows, trader_ids, self.events, self.order_pool)
+        
     def initialize_chartists(self, num_):
         chartists = {}
-        t = 1
         
-        for i in range(num_):
-            value = abs(int(np.random.normal(*self.chart_dist)))
+        for t, value in enumerate(self.draw_population(self.chart_dist, num_), 1):
             trader_id = "chartist_" + str(t)
-            chartists[str(trader_id)] = Chartist(value, trader_id)
-            t += 1
+            chartists[trader_id] = Chartist(value, trader_id, self.events, self.order_pool)
         return chartists
     
     def start(self):
-        for i in range(self.length):
-            price = self.market.market_price
-            
-            for trader in self.traders.values():
-                trader.push(price)
-                
-                self.check_order(trader)
-                
-                self.process_matches(self.market.matches) # assign matches
-                price = self.market.market_price # update the market price 
-                self.market_prices.append(price)
+        if self.profile is None:
+            for _ in self.iter_periods(record_=True):
+                pass
+            self.create_dfs()
+            return
         
+        start = time.perf_counter()
+        for _ in self.iter_periods(record_=True):
+            pass
+        dfs = time.perf_counter()
         self.create_dfs()
+        end = time.perf_counter()
+        self.profile.seconds["create_dfs"] += end - dfs
+        self.profile.total += end - start
+        self.profile_report = self.profile.report()
     
-    def process_matches(self, matches_):
-        if not matches_:
-            return
+    def iter_periods(self, pnl_=False, record_=False, prices_=False):
+        """
+        Runs the remaining periods up to length one at a time. Without record_ neither market_prices nor the tape
+        grow, so memory does not depend on the length of the run and consumers can plot, write out or stop early
+        :param pnl_: include the aggregate pnl of all traders in the snapshots (one pass over all traders per period)
+        :param record_: keep every price in market_prices and every fill on the tape as start does
+        :param prices_: keep every price in market_prices but no tape, for consumers that take the prices away
+        :return: generator of PeriodSnapshot
+        """
+        self.record = record_
+        self.record_prices = record_ or prices_
+        for i in range(self.elapsed, self.length):
+            self.step(i)
+            self.elapsed = i + 1
+            snapshot = self.snapshot(pnl_)
+            if self.archive is not None:
+                self.archive.record_period(snapshot)
+            yield snapshot
+    
+    def step(self, period_):
+        """
+        Lets every trader act once on the latest price
+        :param period_: index of the period
+        :return: market price at the end of the period
+        """
+        self.period = period_
+        self.period_volume = 0
+        self.period_trades = 0
+        price = self.market.market_price
         
-        if matches_:
-            for match in matches_:
-                self.traders[[*match][0]].portfolio.update(*list(match.values())[0])
-                #self.traders[[*match][0]].push(*list(match.values())[0]) # something here
-                
-    def check_order(self, trader_):
-        if trader_.order is not None:
-            self.market.push(trader_.order)
+        for cohort in self.cohorts:
+            price = self.step_cohort(cohort, price)
+        
+        signal = self.signal
+        for trader in self.traders.values():
+            signal(trader.push, price)
+            price = self.submit(trader.order)
+        
+        if self.depth is not None and not self.depth.per_order:
+            self.depth.record(self.market.orderbook, period_)
+        if self.profile is not None:
+            self.profile.end_period(len(self.trader_index), self.period_trades)
+        return price
+    
+    def snapshot(self, pnl_=False):
+        """
+        Summary of the last period
+        :param pnl_: compute the aggregate pnl, None otherwise
+        :return: PeriodSnapshot
+        """
+        best_bid, best_ask = self.market.orderbook.get_quotes()
+        return PeriodSnapshot(self.period, self.market.market_price, self.period_volume, self.period_trades,
+                              best_bid, best_ask, self.total_pnl() if pnl_ else None)
+    
+    def total_pnl(self):
+        """
+        Returns the pnl summed over all traders
+        :return: float
+        """
+        pnl = sum(float(cohort.total_pnl().sum()) for cohort in self.cohorts)
+        for trader in self.traders.values():
+            pnl += trader.portfolio.pnl.total_pnl()
+        return pnl
+    
+    def step_cohort(self, cohort_, price_):
+        """
+        Steps a cohort, in one batch or trader by trader
+        :param cohort_: Cohort
+        :param price_: market price at the start of the step
+        :return: market price after the cohort's orders
+        """
+        if self.cohort_mode == "batch":
+            for order in self.signal(cohort_.push, price_):
+                price_ = self.submit(order)
         else:
+            for i in range(len(cohort_)):
+                price_ = self.submit(self.signal(cohort_.push_one, price_, i))
+        return price_
+    
+    def submit(self, order_):
+        """
+        Submits an order (None if the trader does not trade) and assigns its fills
+        :param order_: Order or None
+        :return: market price after the order
+        """
+        if order_ is not None:
+            self.match(order_)
+            self.fill(self.market.matches) # assign matches
+            if self.depth is not None and self.depth.per_order:
+                self.depth.record(self.market.orderbook, self.market.orderbook.next_order_id)
+        price = self.market.market_price # update the market price 
+        if self.record_prices:
+            self.market_prices.append(price)
+        if self.archive is not None:
+            self.archive.record_price(price)
+        return price
+    
+    def process_matches(self, fills_):
+        if not fills_:
+            return
+        
+        side = fills_.side
+        self.period_volume += sum(fills_.quantities)
+        self.period_trades += len(fills_)
+        if self.record:
+            self.tape.record(self.period, fills_)
+        if self.archive is not None:
+            self.archive.record_trades(self.period, fills_)
+        
+        if fills_.trader_id in fills_.counterparties:
+            # the order crossed a resting order of the same trader, its updates keep the order of the fills
+            for counterparty, price, quantity in zip(fills_.counterparties, fills_.prices, fills_.quantities):
+                self.update_portfolio(counterparty, price, -side * quantity)
+                self.update_portfolio(fills_.trader_id, price, side * quantity)
             return
+        for counterparty, price, quantity in zip(fills_.counterparties, fills_.prices, fills_.quantities):
+            self.update_portfolio(counterparty, price, -side * quantity)
+        # the incoming trader receives all fills of the order at once
+        trader = self.traders.get(fills_.trader_id)
+        if trader is not None:
+            trader.portfolio.update_fills(side, fills_.prices, fills_.quantities)
+        else:
+            cohort, i = self.cohort_members[fills_.trader_id]
+            cohort.update_fills(i, side, fills_.prices, fills_.quantities)
     
-    def create_dfs(self):
+    def update_portfolio(self, trader_id_, price_, quantity_):
+        trader = self.traders.get(trader_id_)
+        if trader is not None:
+            trader.portfolio.update(price_, quantity_)
+        else:
+            cohort, i = self.cohort_members[trader_id_]
+            cohort.update(i, price_, quantity_)
+    
+    def final_pnl(self):
+        """
+        Returns the pnl of every trader
+        :return: dict of trader id to float
+        """
         pnls = {}
+        for cohort in self.cohorts:
+            pnls.update(zip(cohort.trader_ids, cohort.total_pnl().tolist()))
         for name in list(self.traders.keys()):
             pnls[name] = self.traders[name].portfolio.pnl.total_pnl()
-        self.pnl_df = pd.DataFrame(pnls.items(), columns=['Trader', 'PNL'])
+        return pnls
+    
+    def create_dfs(self):
+        self.pnl_df = pd.DataFrame(self.final_pnl().items(), columns=['Trader', 'PNL'])
         self.market_prices_df = pd.DataFrame(self.market_prices)
 
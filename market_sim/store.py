@@ -0,0 +1,97 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class ResultStore:
+    """
+    Keeps simulation results on the server as NumPy arrays keyed by run id, so that pages only exchange the id.
+    Arrays can grow with append, their capacity doubles so that appending is amortized O(1) per value.
+    The least recently used runs are dropped once the arrays (with their spare capacity) take more than max_bytes_.
+    """
+
+    def __init__(self, max_bytes_=256 * 2 ** 20):
+        """
+        :param max_bytes_: memory budget of all stored arrays
+        """
+        self.max_bytes = max_bytes_
+        self.nbytes = 0
+        self.runs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __contains__(self, run_id_):
+        return run_id_ in self.runs
+
+    def put(self, run_id_, **arrays):
+        """
+        Stores (or replaces) arrays of a run
+        :param run_id_: string id of the run
+        :param arrays: arrays by name, converted with np.asarray
+        :return:
+        """
+        arrays = {name: np.asarray(values) for name, values in arrays.items()}
+        with self.lock:
+            run = self.runs.setdefault(run_id_, {})
+            for name, values in arrays.items():
+                self.replace(run, name, values, len(values))
+            self.runs.move_to_end(run_id_)
+            self.evict(run_id_)
+
+    def append(self, run_id_, name_, values_):
+        """
+        Appends values to a one dimensional array of a run, creating it if needed
+        :param run_id_: string id of the run
+        :param name_: name of the array
+        :param values_: values to append
+        :return: new length of the array
+        """
+        values = np.asarray(values_)
+        with self.lock:
+            run = self.runs.setdefault(run_id_, {})
+            buffer, size = run.get(name_, (np.empty(0, dtype=values.dtype), 0))
+            if size + len(values) > len(buffer):
+                grown = np.empty(max(2 * len(buffer), size + len(values), 1024), dtype=buffer.dtype)
+                grown[:size] = buffer[:size]
+                self.replace(run, name_, grown, size)
+                buffer = grown
+            buffer[size:size + len(values)] = values
+            run[name_] = (buffer, size + len(values))
+            self.runs.move_to_end(run_id_)
+            self.evict(run_id_)
+            return size + len(values)
+
+    def replace(self, run_, name_, buffer_, size_):
+        old = run_.get(name_)
+        if old is not None:
+            self.nbytes -= old[0].nbytes
+        run_[name_] = (buffer_, size_)
+        self.nbytes += buffer_.nbytes
+
+    def get(self, run_id_, name_):
+        """
+        :param run_id_: string id of the run
+        :param name_: name of the array
+        :return: np.ndarray, None if the run or the array is not stored
+        """
+        with self.lock:
+            run = self.runs.get(run_id_)
+            if run is None:
+                return None
+            self.runs.move_to_end(run_id_)
+            if name_ not in run:
+                return None
+            buffer, size = run[name_]
+            return buffer[:size]
+
+    def evict(self, keep_):
+        """
+        Drops least recently used runs until the budget is met, never the run keep_
+        :param keep_: id of the run that was just stored
+        :return:
+        """
+        for run_id in list(self.runs):
+            if self.nbytes <= self.max_bytes:
+                break
+            if run_id != keep_:
+                self.nbytes -= sum(buffer.nbytes for buffer, _ in self.runs.pop(run_id).values())
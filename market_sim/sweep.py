@@ -0,0 +1,224 @@
+import csv
+import io
+import itertools
+import multiprocessing
+import os
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from .simulation import Simulation
+
+# parameters of a sweep point, named like the inputs of the app
+PARAMETERS = ("length", "n_fund", "n_chart", "f_dist_mean", "f_dist_var", "c_dist_mean", "c_dist_var")
+DEFAULTS = {"length": 10, "n_fund": 30, "n_chart": 5, "f_dist_mean": 100, "f_dist_var": 3, "c_dist_mean": 6,
+            "c_dist_var": 2}
+METRICS = ("final_price", "mean_price", "std_price", "trades", "volume", "vwap", "pnl_fundamentalists",
+           "pnl_chartists", "seconds", "error")
+
+
+def grid(**values):
+    """
+    Full factorial design
+    :param values: list of values per parameter, parameters that are not given keep their default
+    :return: list of points (dicts)
+    """
+    names = list(values)
+    points = []
+    for combination in itertools.product(*(values[name] for name in names)):
+        point = dict(DEFAULTS)
+        point.update(zip(names, combination))
+        points.append(point)
+    return points
+
+
+def random_design(num_, seed_=None, **ranges):
+    """
+    Uniform random design
+    :param num_: number of points
+    :param seed_: seed of the design
+    :param ranges: (low, high) per parameter, integers are drawn if both bounds are ints
+    :return: list of points (dicts)
+    """
+    rng = np.random.default_rng(seed_)
+    columns = {}
+    for name, (low, high) in ranges.items():
+        if isinstance(low, int) and isinstance(high, int):
+            columns[name] = rng.integers(low, high, endpoint=True, size=num_).tolist()
+        else:
+            columns[name] = rng.uniform(low, high, size=num_).tolist()
+
+    points = []
+    for i in range(num_):
+        point = dict(DEFAULTS)
+        point.update((name, column[i]) for name, column in columns.items())
+        points.append(point)
+    return points
+
+
+def point_key(point_):
+    return ",".join(str(point_[name]) for name in PARAMETERS)
+
+
+def point_cost(point_):
+    return point_["length"] * (point_["n_fund"] + point_["n_chart"])
+
+
+def summarize(sim_):
+    """
+    Summary statistics of a finished simulation
+    :param sim_: Simulation
+    :return: dict of metrics
+    """
+    prices = np.asarray(sim_.market_prices, dtype=float)
+    pnl = sim_.pnl_df
+    fundamentalists = pnl["Trader"].str.startswith("fundamentalist")
+    return {
+        "final_price": prices[-1] if len(prices) else float('nan'),
+        "mean_price": prices.mean() if len(prices) else float('nan'),
+        "std_price": prices.std() if len(prices) else float('nan'),
+        "trades": len(sim_.tape),
+        "volume": int(sim_.tape.column("quantity").sum()),
+        "vwap": sim_.tape.vwap(),
+        "pnl_fundamentalists": pnl["PNL"][fundamentalists].mean(),
+        "pnl_chartists": pnl["PNL"][~fundamentalists].mean(),
+    }
+
+
+def _run_point(task_):
+    """
+    Simulates one point in a worker
+    :param task_: tuple (point, seed, simulation keyword arguments)
+    :return: dict row of the results table
+    """
+    point, seed, kwargs = task_
+    row = dict(point)
+    start = time.perf_counter()
+    try:
+        sim = Simulation(point["length"], point["n_fund"], point["n_chart"],
+                         (point["f_dist_mean"], point["f_dist_var"]), (point["c_dist_mean"], point["c_dist_var"]),
+                         seed_=seed, **kwargs)
+        sim.start()
+        row.update(summarize(sim))
+        row["error"] = ""
+    except Exception as e:
+        # one line per row, the table is repaired line by line after a crash
+        row["error"] = " ".join((type(e).__name__ + ": " + str(e)).split())
+    row["seconds"] = time.perf_counter() - start
+    return row
+
+
+class Sweep:
+    """
+    Runs a design of Simulation configurations over a process pool, longest jobs (length x traders) first.
+    Every finished point is appended to a csv results table right away, so an interrupted sweep resumes with the
+    points that are not in the table yet or that failed. A row cut off by a crash is dropped when the table is read
+    and removed before new rows are appended. Each point is seeded from the sweep seed and its parameters, so results
+    do not depend on the order or the size of the design.
+    """
+
+    def __init__(self, points_, path_, seed_=0, processes_=None, **kwargs):
+        """
+        :param points_: list of points, see grid and random_design
+        :param path_: csv file of the results table
+        :param seed_: int seed of the sweep
+        :param processes_: number of worker processes, defaults to the number of cores
+        :param kwargs: further keyword arguments of Simulation
+        """
+        self.points = points_
+        self.path = path_
+        self.seed = seed_
+        self.processes = processes_ or multiprocessing.cpu_count()
+        self.kwargs = kwargs
+
+    def lines(self):
+        """
+        Header and complete rows of the results table, a row is complete if it ends with a newline and has every field
+        :return: list of strings, empty if there is no table
+        """
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, newline="") as f:
+            lines = f.readlines()
+        if not lines or not lines[0].endswith("\n"):
+            return []
+        fields = len(PARAMETERS + METRICS)
+        seconds = (PARAMETERS + METRICS).index("seconds")
+        rows = [line for line in lines[1:] if line.endswith("\n")]
+        return lines[:1] + [line for line, row in zip(rows, csv.reader(rows))
+                            if len(row) == fields and row[seconds]]
+
+    def finished(self):
+        """
+        Keys of the points in the results table that did not fail
+        :return: set of strings
+        """
+        return {point_key(row) for row in csv.DictReader(self.lines()) if not row["error"]}
+
+    def pending(self):
+        """
+        Points that still have to be simulated, longest first
+        :return: list of points
+        """
+        done = self.finished()
+        points = [point for point in self.points if point_key(point) not in done]
+        return sorted(points, key=point_cost, reverse=True)
+
+    def seed_of(self, point_):
+        return np.random.SeedSequence([self.seed, zlib.crc32(point_key(point_).encode())])
+
+    def start(self):
+        tasks = [(point, self.seed_of(point), self.kwargs) for point in self.pending()]
+        if not tasks:
+            return
+
+        self.repair()
+        new_file = not os.path.exists(self.path)
+        with open(self.path, "a", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=PARAMETERS + METRICS)
+            if new_file:
+                writer.writeheader()
+
+            if self.processes == 1:
+                rows = map(_run_point, tasks)
+            else:
+                pool = multiprocessing.Pool(min(self.processes, len(tasks)))
+                rows = pool.imap_unordered(_run_point, tasks)
+            try:
+                for row in rows:
+                    writer.writerow(row)
+                    f.flush()
+            finally:
+                if self.processes != 1:
+                    pool.terminate()
+
+    def repair(self):
+        """
+        Rewrites the results table without rows that a crash cut off, so new rows start on a line of their own
+        :return:
+        """
+        if not os.path.exists(self.path):
+            return
+        lines = self.lines()
+        with open(self.path, newline="") as f:
+            if f.read() == "".join(lines):
+                return
+        if not lines:
+            os.remove(self.path)
+            return
+        with open(self.path + ".tmp", "w", newline="") as f:
+            f.writelines(lines)
+        os.replace(self.path + ".tmp", self.path)
+
+    def results(self):
+        """
+        Returns the results table, the last row of every point if a failed point was retried
+        :return: pd.DataFrame with one row per point
+        """
+        lines = self.lines()
+        if not lines:
+            return pd.DataFrame(columns=PARAMETERS + METRICS)
+        table = pd.read_csv(io.StringIO("".join(lines)))
+        return table.drop_duplicates(subset=list(PARAMETERS), keep="last").reset_index(drop=True)
@@ -0,0 +1,161 @@
+from itertools import chain
+
+import numpy as np
+
+from .markets import BUY
+
+
+def expand(pending_, traders_, start_):
+    """
+    Expands queued fills into the columns of the tape
+    :param pending_: list of (period, Fills)
+    :param traders_: dict of trader id to index
+    :param start_: sequence number of the first fill
+    :return: dict of column name to np.ndarray of the fills in order
+    """
+    counts = [len(fills) for _, fills in pending_]
+    n = sum(counts)
+    trader = np.repeat([traders_[fills.trader_id] for _, fills in pending_], counts)
+    side = np.repeat([fills.side for _, fills in pending_], counts)
+    counterparties = [traders_[name] for name in chain.from_iterable(fills.counterparties for _, fills in pending_)]
+    buy = side == BUY
+    return {
+        "period": np.repeat([period for period, _ in pending_], counts),
+        "sequence": np.arange(start_, start_ + n),
+        "buyer": np.where(buy, trader, counterparties),
+        "seller": np.where(buy, counterparties, trader),
+        "price": np.array(list(chain.from_iterable(fills.prices for _, fills in pending_)), dtype=np.float64),
+        "quantity": np.array(list(chain.from_iterable(fills.quantities for _, fills in pending_)), dtype=np.int64),
+        "aggressor": side,
+    }
+
+
+class TradeTape:
+    """
+    Columnar record of all trades of a run. Columns are NumPy arrays with a fixed dtype that grow in chunks,
+    traders are referenced by their integer index in Simulation.traders. record only queues the Fills of an
+    order, the queue is expanded into the columns once it holds a chunk of trades or when the columns are read.
+    """
+    COLUMNS = (
+        ("period", np.int64),
+        ("sequence", np.int64),
+        ("buyer", np.int32),
+        ("seller", np.int32),
+        ("price", np.float64),
+        ("quantity", np.int64),
+        ("aggressor", np.int8),  # side of the incoming order, BUY or SELL
+    )
+
+    def __init__(self, traders_, chunk_size_=65536):
+        """
+        :param traders_: dict of trader id to index
+        :param chunk_size_: rows by which the columns grow
+        """
+        self.traders = traders_
+        self.chunk_size = chunk_size_
+        self.size = 0
+        self._columns = {name: np.empty(chunk_size_, dtype) for name, dtype in self.COLUMNS}
+        self._pending = [] # (period, Fills) not yet in the columns
+        self._pending_rows = 0
+
+    def __len__(self):
+        return self.size + self._pending_rows
+
+    def _reserve(self, n_):
+        """
+        Grows all columns by whole chunks until n_ more rows fit
+        :param n_: number of rows to add
+        :return:
+        """
+        capacity = len(self._columns["price"])
+        if self.size + n_ <= capacity:
+            return
+        chunks = -(-(self.size + n_ - capacity) // self.chunk_size)
+        for name, column in self._columns.items():
+            grown = np.empty(capacity + chunks * self.chunk_size, column.dtype)
+            grown[:self.size] = column[:self.size]
+            self._columns[name] = grown
+
+    def record(self, period_, fills_):
+        """
+        Appends the fills of one incoming order
+        :param period_: simulation period
+        :param fills_: Fills of the order, not modified afterwards
+        :return:
+        """
+        self._pending.append((period_, fills_))
+        self._pending_rows += len(fills_)
+        if self._pending_rows >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Expands the queued fills into the columns
+        :return:
+        """
+        if not self._pending:
+            return
+        n = self._pending_rows
+        self._reserve(n)
+        i, j = self.size, self.size + n
+        for name, values in expand(self._pending, self.traders, i).items():
+            self._columns[name][i:j] = values
+        self.size = j
+        self._pending = []
+        self._pending_rows = 0
+
+    def column(self, name_):
+        """
+        Returns a view on the filled part of a column
+        :param name_: column name, see COLUMNS
+        :return: np.ndarray
+        """
+        self.flush()
+        return self._columns[name_][:self.size]
+
+    def arrays(self):
+        """
+        Returns views on all columns
+        :return: dict of column name to np.ndarray
+        """
+        return {name: self.column(name) for name, _ in self.COLUMNS}
+
+    # Analytics here:
+
+    def vwap(self):
+        """
+        Volume weighted average price over all trades
+        :return: float vwap
+        """
+        quantity = self.column("quantity")
+        if not quantity.sum():
+            return float('nan')
+        return float(np.dot(self.column("price"), quantity) / quantity.sum())
+
+    def volume_per_period(self, periods_):
+        """
+        Traded quantity per period
+        :param periods_: number of periods of the run
+        :return: np.ndarray of length periods_
+        """
+        return np.bincount(self.column("period"), weights=self.column("quantity"), minlength=periods_)
+
+    def turnover(self, traders_):
+        """
+        Bought plus sold quantity per trader
+        :param traders_: number of traders
+        :return: np.ndarray of length traders_
+        """
+        quantity = self.column("quantity")
+        return (np.bincount(self.column("buyer"), weights=quantity, minlength=traders_)
+                + np.bincount(self.column("seller"), weights=quantity, minlength=traders_))
+
+    def net_quantity(self, traders_):
+        """
+        Bought minus sold quantity per trader
+        :param traders_: number of traders
+        :return: np.ndarray of length traders_
+        """
+        quantity = self.column("quantity")
+        return (np.bincount(self.column("buyer"), weights=quantity, minlength=traders_)
+                - np.bincount(self.column("seller"), weights=quantity, minlength=traders_))
@@ -1,12 +1,21 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
 from .algorithm import Algorithms
 from .indicators import rolling
+from . import events
+from .markets import LIMIT, MARKET, NO_POOL
+from .pnl import PnL
 
 
 class Fundamentalist(Algorithms):
     
-    def __init__(self, value_, trader_id_):
+    def __init__(self, value_, trader_id_, events_=events.NULL_SINK, pool_=NO_POOL):
         self.value = value_
         self.trader_id = trader_id_
+        self.events = events_
+        self.pool = pool_
         Algorithms.__init__(self)
     
     def push(self, market_price_):
@@ -17,19 +26,19 @@ class Fundamentalist(Algorithms):
     def signal(self):
         
         if self.market_price < self.value:
-            print("buy")
             self.set_position(0.3)
             
         if self.market_price >= self.value:
-            print("sell")
             self.set_position(-0.3)
 
 
 class Chartist(Algorithms):
     
-    def __init__(self, window_, trader_id_):
+    def __init__(self, window_, trader_id_, events_=events.NULL_SINK, pool_=NO_POOL):
         self.value = window_
         self.trader_id = trader_id_
+        self.events = events_
+        self.pool = pool_
         Algorithms.__init__(self)
         
         self.momentum = rolling.RollingIndicator(window_)
@@ -42,9 +51,240 @@ class Chartist(Algorithms):
     def signal(self):
         self.momentum.push(self.market_price)
         if self.momentum.momentum() > 0:
-            print("buy")
             self.set_position(0.3)
             
         if self.momentum.momentum() <= 0:
-            print("sell")
             self.set_position(-0.3)
+
+
+class Cohort(ABC):
+    """
+    Array backed population of traders. Cash, stock and outstanding amounts are NumPy arrays, so signals and
+    order sizes of many traders are computed in one vectorized step. Subclasses define the signal.
+    Pnl is marked to market on arrays, fills (which are comparatively rare) go through one PnL instance per trader.
+    """
+    order_type = LIMIT
+
+    def __init__(self, trader_ids_, limit_prices_, events_=events.NULL_SINK, pool_=NO_POOL,
+                 cash_=10000.0, stock_=100, margin_=1.0):
+        n = len(trader_ids_)
+        self.trader_ids = list(trader_ids_)
+        self.limit_prices = list(limit_prices_)
+        self.events = events_
+        self.pool = pool_
+        self.margin = margin_
+
+        self.cash = np.full(n, cash_, dtype=float)
+        self.stock = np.full(n, stock_, dtype=np.int64)
+        self.outstanding_cash = np.zeros(n)
+        self.outstanding_stock = np.zeros(n, dtype=np.int64)
+
+        self.pnls = []
+        for i in range(n):
+            pnl = PnL()
+            pnl.push(0.0, stock_)
+            self.pnls.append(pnl)
+        self.total_quantity = np.full(n, float(stock_))
+        self.avg_open_price = np.zeros(n)
+        self.realized_pnl = np.zeros(n)
+        self.unrealized_pnl = np.zeros(n)
+
+    def __len__(self):
+        return len(self.trader_ids)
+
+    @abstractmethod
+    def signal(self, market_price_, idx_):
+        """
+        Returns the positions of the selected traders
+        :param market_price_: market price
+        :param idx_: slice of traders
+        :return: np.ndarray of positions (0.3 to buy, -0.3 to sell)
+        """
+
+    def push(self, market_price_, start_=0, stop_=None):
+        """
+        Marks portfolios to market, computes signals and order sizes and reserves cash or stock for the orders
+        :param market_price_: market price seen by the selected traders
+        :param start_: first trader of the step
+        :param stop_: end of the step, all remaining traders by default
+        :return: list of orders, None for traders that do not submit an order
+        """
+        idx = slice(start_, stop_)
+        price = market_price_
+
+        total = self.total_quantity[idx]
+        self.unrealized_pnl[idx] = np.where(total != 0, (price - self.avg_open_price[idx]) * total,
+                                            self.unrealized_pnl[idx])
+
+        position = self.signal(price, idx)
+        amount = np.trunc((self.cash[idx] * position) / (price * self.margin)).astype(np.int64)
+
+        buy = position > 0
+        accepted = np.where(buy,
+                            self.cash[idx] >= self.outstanding_cash[idx] + amount * price,
+                            self.stock[idx] >= self.outstanding_stock[idx] - amount)
+        amount = np.where(accepted, amount, 0)
+        self.outstanding_cash[idx] += np.where(buy, amount * price, 0)
+        self.outstanding_stock[idx] -= np.where(buy, 0, amount)
+
+        if self.events.level <= events.INFO:
+            self.emit_events(price, start_, position, accepted)
+
+        orders = []
+        for i, a in enumerate(amount.tolist(), start_):
+            if a:
+                orders.append(self.pool.acquire(self.order_type, self.trader_ids[i], a, self.limit_prices[i]))
+            else:
+                orders.append(None)
+        return orders
+
+    def push_one(self, market_price_, i_):
+        """
+        Same as push for the single trader i_, on scalars instead of length 1 slices
+        :param market_price_: market price seen by the trader
+        :param i_: index of the trader in the cohort
+        :return: order, None if the trader does not submit an order
+        """
+        price = market_price_
+        total = self.total_quantity.item(i_)
+        if total != 0:
+            self.unrealized_pnl[i_] = (price - self.avg_open_price.item(i_)) * total
+
+        position = self.signal_one(price, i_)
+        cash = self.cash.item(i_)
+        amount = int((cash * position) / (price * self.margin))
+
+        if position > 0:
+            accepted = cash >= self.outstanding_cash.item(i_) + amount * price
+            if accepted:
+                self.outstanding_cash[i_] += amount * price
+        else:
+            accepted = self.stock.item(i_) >= self.outstanding_stock.item(i_) - amount
+            if accepted:
+                self.outstanding_stock[i_] -= amount
+
+        if self.events.level <= events.INFO:
+            self.emit_events(price, i_, np.array([position]), np.array([accepted]))
+
+        if accepted and amount:
+            return self.pool.acquire(self.order_type, self.trader_ids[i_], amount, self.limit_prices[i_])
+        return None
+
+    def signal_one(self, market_price_, i_):
+        """
+        Position of trader i_, subclasses can override it with a scalar signal
+        :param market_price_: market price
+        :param i_: index of the trader
+        :return: float position
+        """
+        return self.signal(market_price_, slice(i_, i_ + 1)).item(0)
+
+    def emit_events(self, market_price_, start_, position_, accepted_):
+        """
+        Emits signal and rejection events of a step, only called if the sink listens
+        :return:
+        """
+        for i, (position, accepted) in enumerate(zip(position_.tolist(), accepted_.tolist()), start_):
+            if self.events.level <= events.DEBUG:
+                self.events.emit(events.DEBUG, events.Event(events.SIGNAL, self.trader_ids[i], market_price_, position))
+            if not accepted:
+                self.events.emit(events.INFO, events.Event(events.REJECTED, self.trader_ids[i], market_price_, 0))
+
+    def update(self, i_, price_, quantity_):
+        """
+        Receives a market fill for trader i_
+        :param i_: index of the trader in the cohort
+        :param price_: fill price
+        :param quantity_: signed quantity, positive if the trader bought
+        :return:
+        """
+        pnl = self.pnls[i_]
+        pnl.push(price_, quantity_)
+        self.total_quantity[i_] = pnl._total_quantity
+        self.avg_open_price[i_] = pnl._avg_open_price
+        self.realized_pnl[i_] = pnl.realized_pnl
+        self.unrealized_pnl[i_] = pnl.unrealized_pnl
+
+        self.cash[i_] -= quantity_ * price_
+        self.stock[i_] += quantity_
+        if quantity_ > 0:
+            self.outstanding_cash[i_] -= quantity_ * price_
+        if quantity_ < 0:
+            self.outstanding_stock[i_] += quantity_
+
+    def update_fills(self, i_, side_, prices_, quantities_):
+        """
+        Receives all fills of one order for trader i_, same as update for every fill with the arrays written once
+        :param i_: index of the trader in the cohort
+        :param side_: BUY or SELL
+        :param prices_: fill prices
+        :param quantities_: unsigned fill quantities
+        :return:
+        """
+        pnl = self.pnls[i_]
+        cash = float(self.cash[i_])
+        outstanding_cash = float(self.outstanding_cash[i_])
+        for price, quantity in zip(prices_, quantities_):
+            pnl.push(price, side_ * quantity)
+            cash -= side_ * quantity * price
+            if side_ > 0:
+                outstanding_cash -= quantity * price
+        traded = side_ * sum(quantities_)
+
+        self.total_quantity[i_] = pnl._total_quantity
+        self.avg_open_price[i_] = pnl._avg_open_price
+        self.realized_pnl[i_] = pnl.realized_pnl
+        self.unrealized_pnl[i_] = pnl.unrealized_pnl
+        self.cash[i_] = cash
+        self.stock[i_] += traded
+        self.outstanding_cash[i_] = outstanding_cash
+        if side_ < 0:
+            self.outstanding_stock[i_] += traded
+
+    def total_pnl(self):
+        """
+        Returns total pnl of all traders
+        :return: np.ndarray
+        """
+        return self.realized_pnl + self.unrealized_pnl
+
+
+class FundamentalistCohort(Cohort):
+    """
+    Fundamentalists as a Cohort, buying below and selling at or above their valuation with limit orders.
+    Stepping one trader at a time with push_one gives the exact sequential mode in which every trader sees the
+    latest price.
+    """
+    order_type = LIMIT
+
+    def __init__(self, values_, trader_ids_, events_=events.NULL_SINK, pool_=NO_POOL, **kwargs):
+        Cohort.__init__(self, trader_ids_, values_, events_, pool_, **kwargs)
+        self.value = np.asarray(values_, dtype=float)
+
+    def signal(self, market_price_, idx_):
+        return np.where(market_price_ < self.value[idx_], 0.3, -0.3)
+
+    def signal_one(self, market_price_, i_):
+        return 0.3 if market_price_ < self.value.item(i_) else -0.3
+
+
+class ChartistCohort(Cohort):
+    """
+    Chartists as a Cohort, trading on momentum with market orders. All chartists share one ring buffer of
+    past prices sized to the largest window, momentum is a single gather new - price[t - window].
+    The cohort is stepped as a whole once per period, so all chartists see the same price history.
+    """
+    order_type = MARKET
+
+    def __init__(self, windows_, trader_ids_, events_=events.NULL_SINK, pool_=NO_POOL, **kwargs):
+        Cohort.__init__(self, trader_ids_, [None] * len(trader_ids_), events_, pool_, **kwargs)
+        self.window = np.asarray(windows_, dtype=np.int64)
+        self.prices = rolling.RingBuffer(int(self.window.max(initial=0)) + 1)
+
+    def push(self, market_price_):
+        self.prices.push(market_price_)
+        return Cohort.push(self, market_price_)
+
+    def signal(self, market_price_, idx_):
+        momentum = market_price_ - self.prices.lagged(self.window[idx_])
+        return np.where(momentum > 0, 0.3, -0.3)
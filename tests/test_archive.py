@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from market_sim.archive import RunReader, RunWriter
+from market_sim.simulation import Simulation
+
+
+@pytest.mark.parametrize("chunk_size", [7, 64, 65536])
+def test_run_matches_simulation(chunk_size, tmp_path):
+    writer = RunWriter(str(tmp_path), chunk_size)
+    sim = Simulation(20, 40, 10, (100, 3), (6, 2), seed_=0, archive_=writer)
+    sim.start()
+    writer.finish(sim)
+
+    reader = RunReader(str(tmp_path))
+    assert reader.complete
+    assert len(reader) == len(sim.tape)
+    for name, column in sim.tape.arrays().items():
+        assert np.array_equal(reader.column("trades", name), column)
+    assert reader.market_prices().tolist() == sim.market_prices
+    periods = reader.table("periods")
+    assert periods["period"].tolist() == list(range(20))
+    assert periods["volume"].sum() == sim.tape.column("quantity").sum()
+    pnl = reader.pnl_df().set_index("Trader")["PNL"]
+    assert pnl.sort_index().equals(sim.pnl_df.set_index("Trader")["PNL"].sort_index())
+
+
+def test_unfinished_run_is_readable_up_to_its_last_chunk(tmp_path):
+    writer = RunWriter(str(tmp_path), 50)
+    sim = Simulation(20, 40, 10, (100, 3), (6, 2), seed_=0, archive_=writer)
+    for _ in sim.iter_periods():
+        pass
+
+    reader = RunReader(str(tmp_path))
+    assert not reader.complete
+    # one price per order, 1000 prices fill 20 chunks
+    assert len(reader.market_prices()) == 1000
+    assert len(reader) % 50 == 0
+    assert len(reader.chunks("trades", "price")) == len(reader) // 50
@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+
+from market_sim.indicators import batch, rolling
+
+WINDOWS = (1, 2, 3, 7, 20)
+N = 500
+
+
+def prices(kind_):
+    rng = np.random.default_rng(2)
+    if kind_ == "int":
+        return rng.integers(50, 150, N).astype(float)
+    if kind_ == "float":
+        return rng.normal(100, 5, N)
+    if kind_ == "flat":
+        # runs of equal prices drive the moving variance to exactly 0 and make it reseed
+        return np.repeat(rng.integers(95, 105, N // 10), 10).astype(float)
+    return 100 + np.cumsum(rng.normal(0, 1, N))
+
+
+def assert_equal(streaming_, batch_):
+    assert np.array_equal(np.asarray(streaming_, dtype=float), np.asarray(batch_, dtype=float), equal_nan=True)
+
+
+def stream(x_, window_, method_, *args):
+    indicator = rolling.RollingIndicator(window_)
+    values = []
+    for value in x_.tolist():
+        indicator.push(value)
+        values.append(getattr(indicator, method_)(*args))
+    return values
+
+
+@pytest.mark.parametrize("kind", ["int", "float", "flat", "walk"])
+@pytest.mark.parametrize("window", WINDOWS)
+@pytest.mark.parametrize("name", ["sma", "ema", "variance", "standard_deviation", "momentum"])
+def test_rolling_indicator(kind, window, name):
+    x = prices(kind)
+    assert_equal(stream(x, window, name), getattr(batch, name)(x, window))
+
+
+@pytest.mark.parametrize("kind", ["int", "walk"])
+@pytest.mark.parametrize("window", WINDOWS)
+def test_bollinger_band(kind, window):
+    x = prices(kind)
+    streaming = stream(x, window, "bollinger_band", 2)
+    upper, lower = batch.bollinger_band(x, window, 2)
+    assert_equal([band[0] for band in streaming], upper)
+    assert_equal([band[1] for band in streaming], lower)
+
+
+@pytest.mark.parametrize("kind", ["int", "walk"])
+@pytest.mark.parametrize("window", WINDOWS)
+def test_rate_of_change(kind, window):
+    x = prices(kind)
+    indicator = rolling.RollingIndicator(window)
+    streaming = []
+    for value in x.tolist():
+        indicator.push(value)
+        # the streaming class divides by the evicted value, which is 0 before the window is full
+        streaming.append(indicator.rate_of_change() if indicator.old_val else np.nan)
+    streaming = np.array(streaming)
+    defined = ~np.isnan(streaming)
+    assert_equal(streaming[defined], batch.rate_of_change(x, window)[defined])
+
+
+@pytest.mark.parametrize("kind", ["int", "float", "walk"])
+@pytest.mark.parametrize("window", [2, 3, 7, 20])
+def test_indicators(kind, window):
+    x = prices(kind)
+    rng = np.random.default_rng(3)
+    high = x + rng.random(N)
+    low = x - rng.random(N)
+    indicators = rolling.Indicators(Close=window, High=window, Low=window, macd_long=window + 10, macd_short=window)
+
+    rsi, macd, stochastic, williams, upper, lower = [], [], [], [], [], []
+    for close, h, l in zip(x.tolist(), high.tolist(), low.tolist()):
+        indicators.push(close, h, l, close, close)
+        rsi.append(indicators.relative_strength_index())
+        macd.append(indicators.moving_average_convergence_divergence())
+        stochastic.append(indicators.stochastic_oscillator())
+        williams.append(indicators.williams_r())
+        channel = indicators.donchian_channel()
+        upper.append(channel[0])
+        lower.append(channel[1])
+
+    assert_equal(rsi, batch.relative_strength_index(x, window))
+    assert_equal(macd, batch.moving_average_convergence_divergence(x, window + 10, window))
+    assert_equal(stochastic, batch.stochastic_oscillator(x, high, low, window))
+    assert_equal(williams, batch.williams_r(x, high, low, window))
+    batch_upper, batch_lower = batch.donchian_channel(high, low, window)
+    assert_equal(upper, batch_upper)
+    assert_equal(lower, batch_lower)
+
+
+@pytest.mark.parametrize("window", WINDOWS)
+def test_rolling_extrema(window):
+    x = prices("walk")
+    maximum = rolling.RollingExtremum(window, maximum_=True)
+    minimum = rolling.RollingExtremum(window)
+    highs, lows = [], []
+    for value in x.tolist():
+        maximum.push(value)
+        minimum.push(value)
+        highs.append(maximum.value())
+        lows.append(minimum.value())
+    assert_equal(highs, batch.rolling_max(x, window))
+    assert_equal(lows, batch.rolling_min(x, window))
+
+
+@pytest.mark.parametrize("kind", ["int", "float", "walk"])
+def test_cumulative_statistics(kind):
+    x = prices(kind)
+    statistics = rolling.CumulativeStatistics()
+    means, variances = [], []
+    for value in x.tolist():
+        statistics.push(value)
+        means.append(statistics.mean())
+        variances.append(statistics.variance())
+    mean, variance = batch.cumulative_statistics(x)
+    assert_equal(means, mean)
+    assert_equal(variances, variance)
@@ -0,0 +1,49 @@
+import io
+
+import pytest
+
+from market_sim import checkpoint, events
+from market_sim.simulation import Simulation
+
+
+class RecordingUnpickler(checkpoint._Unpickler):
+
+    def __init__(self, file_):
+        checkpoint._Unpickler.__init__(self, file_, events.NULL_SINK, None, None)
+        self.modules = set()
+
+    def find_class(self, module, name):
+        self.modules.add(module)
+        return checkpoint._Unpickler.find_class(self, module, name)
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"cohort_": True}, {"cohort_": "exact"},
+                                    {"recycle_orders_": True, "profile_": True}])
+def test_fingerprint_covers_pickled_classes(kwargs):
+    sim = Simulation(20, 40, 10, (100, 3), (6, 2), seed_=0, **kwargs)
+    sim.start()
+    unpickler = RecordingUnpickler(io.BytesIO(checkpoint._dump(sim, True)))
+    unpickler.load()
+    pickled = {module[len("market_sim."):].replace(".", "/") + ".py"
+               for module in unpickler.modules if module.startswith("market_sim.")}
+    assert pickled <= set(checkpoint._PICKLED_MODULES)
+
+
+def test_restored_run_continues_like_the_original():
+    reference = Simulation(40, 40, 10, (100, 3), (6, 2), seed_=3)
+    reference.start()
+
+    sim = Simulation(20, 40, 10, (100, 3), (6, 2), seed_=3)
+    sim.start()
+    restored = checkpoint.loads(checkpoint.dumps(sim))
+    restored.length = 40
+    restored.start()
+    assert restored.market_prices == reference.market_prices[len(sim.market_prices):]
+    assert restored.pnl_df.equals(reference.pnl_df)
+
+
+def test_other_fingerprint_is_refused():
+    data = bytearray(checkpoint.dumps(Simulation(5, 10, 2, (100, 3), (6, 2), seed_=0)))
+    data[checkpoint._HEADER.size] ^= 0xff
+    with pytest.raises(ValueError):
+        checkpoint.loads(bytes(data))
@@ -0,0 +1,72 @@
+import math
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+from market_sim.downsample import downsample, lttb, min_max
+
+
+def reference_lttb(x_, y_, threshold_):
+    """
+    Largest-Triangle-Three-Buckets as in the reference implementation (Steinarsson, 2013), point by point. The
+    bucket size is an exact fraction, so floor(i * every) is not off by one where i * every is an integer
+    """
+    n = len(y_)
+    every = Fraction(n - 2, threshold_ - 2)
+    kept = [0]
+    a = 0
+    for i in range(threshold_ - 2):
+        avg_start = math.floor((i + 1) * every) + 1
+        avg_stop = min(math.floor((i + 2) * every) + 1, n)
+        avg_x = sum(x_[avg_start:avg_stop]) / (avg_stop - avg_start)
+        avg_y = sum(y_[avg_start:avg_stop]) / (avg_stop - avg_start)
+
+        max_area, next_a = -1.0, None
+        for j in range(math.floor(i * every) + 1, math.floor((i + 1) * every) + 1):
+            area = abs((x_[a] - avg_x) * (y_[j] - y_[a]) - (x_[a] - x_[j]) * (avg_y - y_[a])) * 0.5
+            if area > max_area:
+                max_area, next_a = area, j
+        kept.append(next_a)
+        a = next_a
+    kept.append(n - 1)
+    return kept
+
+
+# (47, 35), (54, 48) and (96, 72) have integer edges i * every that floating point rounds to just below
+@pytest.mark.parametrize("n, threshold", [(10, 3), (10, 4), (47, 35), (54, 48), (96, 72), (100, 7), (1000, 33),
+                                          (1003, 500), (4999, 2000)])
+def test_lttb_matches_reference(n, threshold):
+    rng = np.random.default_rng(n)
+    y = 100 + np.cumsum(rng.normal(0, 1, n))
+    x = np.arange(n, dtype=float)
+    assert lttb(y, threshold).tolist() == reference_lttb(x.tolist(), y.tolist(), threshold)
+
+
+def test_lttb_matches_reference_with_x():
+    rng = np.random.default_rng(0)
+    x = np.cumsum(rng.uniform(0.5, 1.5, 800))
+    y = rng.normal(0, 1, 800)
+    assert lttb(y, 57, x).tolist() == reference_lttb(x.tolist(), y.tolist(), 57)
+
+
+def test_short_series_are_kept():
+    y = np.arange(5, dtype=float)
+    assert lttb(y, 5).tolist() == [0, 1, 2, 3, 4]
+    assert min_max(y, 10).tolist() == [0, 1, 2, 3, 4]
+
+
+def test_min_max_keeps_extremes():
+    rng = np.random.default_rng(1)
+    y = rng.normal(0, 1, 1000)
+    kept = min_max(y, 100)
+    assert kept[0] == 0 and kept[-1] == 999
+    assert np.all(np.diff(kept) >= 0)
+    assert np.argmax(y) in kept and np.argmin(y) in kept
+
+
+def test_downsample_range():
+    y = np.sin(np.linspace(0, 20, 3000))
+    positions, values = downsample(y, 50, start_=1000, stop_=2000)
+    assert positions[0] == 1000 and positions[-1] == 1999
+    assert np.array_equal(values, y[positions])
@@ -0,0 +1,217 @@
+import numpy as np
+import pytest
+
+from market_sim.depth import DepthReader, DepthRecorder
+from market_sim.markets import OrderBook, Order, PriceLevels, LIMIT, MARKET, BUY, SELL
+from market_sim.simulation import Simulation
+from market_sim.tape import TradeTape
+
+
+def limit(trader_, quantity_, price_):
+    return Order(LIMIT, trader_, quantity_, price_)
+
+
+def market(trader_, quantity_):
+    return Order(MARKET, trader_, quantity_)
+
+
+def resting(level_):
+    return [(order.trader_id, order.quantity) for order in level_["orders"]]
+
+
+def test_fifo_within_level():
+    # sell orders rest in the bid book, several of them from one trader at one price
+    book = OrderBook()
+    for trader, quantity in (("a", 5), ("b", 3), ("a", 2), ("c", 4)):
+        book.push(limit(trader, -quantity, 101))
+
+    book.push(limit("d", 9, 101))
+    fills = book.matches
+    assert fills.counterparties == ["a", "b", "a"]
+    assert fills.quantities == [5, 3, 1]
+    assert fills.prices == [101, 101, 101]
+    assert fills.side == BUY
+
+    level = book.bid_book[101]
+    assert resting(level) == [("a", 1), ("c", 4)]
+    assert level["size"] == 5
+    assert level["number_orders"] == 2
+    assert 101 not in book.ask_book
+
+
+def test_partial_fill_keeps_level():
+    book = OrderBook()
+    book.push(limit("a", 10, 99))
+    book.push(limit("b", 4, 99))
+    book.push(market("c", -3))
+
+    level = book.ask_book[99]
+    assert resting(level) == [("a", 7), ("b", 4)]
+    assert level["size"] == 11
+    assert book.get_quotes() == (99, None)
+
+
+def test_sell_walks_buy_levels():
+    # buy orders rest in the ask book, best (highest) first
+    book = OrderBook()
+    book.push(limit("x", 5, 99))
+    book.push(limit("y", 5, 98))
+    book.push(limit("z", 5, 97))
+
+    book.push(market("s", -12))
+    fills = book.matches
+    assert fills.side == SELL
+    assert fills.counterparties == ["x", "y", "z"]
+    assert fills.prices == [99, 98, 97]
+    assert fills.quantities == [5, 5, 2]
+    assert book.market_price == 97
+    assert list(book.ask_book) == [97]
+    assert resting(book.ask_book[97]) == [("z", 3)]
+    assert book.get_statistics() == (0, 3, 0, 1, 0, 1)
+
+
+def test_sell_fills_book_both_sides():
+    sim = Simulation(1, 4, 0, (100, 3), (6, 2), seed_=0)
+    buyers, seller = ["fundamentalist_1", "fundamentalist_2"], "fundamentalist_3"
+    stock = {name: sim.traders[name].portfolio.stock for name in buyers + [seller]}
+    cash = {name: sim.traders[name].portfolio.cash for name in buyers + [seller]}
+
+    sim.market.push(limit(buyers[0], 2, 99))
+    sim.market.push(limit(buyers[1], 2, 98))
+    sim.market.push(limit(seller, -3, 97))
+    sim.process_matches(sim.market.matches)
+
+    assert sim.traders[buyers[0]].portfolio.stock == stock[buyers[0]] + 2
+    assert sim.traders[buyers[1]].portfolio.stock == stock[buyers[1]] + 1
+    assert sim.traders[seller].portfolio.stock == stock[seller] - 3
+    assert sim.traders[buyers[0]].portfolio.cash == cash[buyers[0]] - 2 * 99
+    assert sim.traders[seller].portfolio.cash == cash[seller] + 2 * 99 + 98
+
+    tape = sim.tape.arrays()
+    index = sim.trader_index
+    assert tape["buyer"].tolist() == [index[buyers[0]], index[buyers[1]]]
+    assert tape["seller"].tolist() == [index[seller]] * 2
+    assert tape["aggressor"].tolist() == [SELL, SELL]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64])
+def test_tape_chunks(chunk_size):
+    reference = Simulation(20, 40, 10, (100, 3), (6, 2), seed_=0)
+    reference.start()
+    sim = Simulation(20, 40, 10, (100, 3), (6, 2), seed_=0)
+    sim.tape = TradeTape(sim.trader_index, chunk_size)
+    sim.start()
+    assert len(sim.tape) == len(reference.tape)
+    for name, column in reference.tape.arrays().items():
+        assert np.array_equal(sim.tape.column(name), column)
+    assert np.array_equal(sim.tape.column("sequence"), np.arange(len(sim.tape)))
+
+
+def scan(book_):
+    """
+    Statistics recomputed from the resting orders
+    """
+    bid = [order.quantity for level in book_.bid_book.values() for order in level["orders"]]
+    ask = [order.quantity for level in book_.ask_book.values() for order in level["orders"]]
+    return sum(bid), sum(ask), len(bid), len(ask), len(book_.bid_book), len(book_.ask_book)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_statistics_match_scan(seed):
+    rng = np.random.default_rng(seed)
+    book = OrderBook()
+    for i in range(2000):
+        quantity = int(rng.integers(1, 20)) * int(rng.choice((-1, 1)))
+        if rng.random() < 0.2:
+            book.push(market("t" + str(i % 7), quantity))
+        else:
+            book.push(limit("t" + str(i % 7), quantity, 100 + int(rng.integers(-10, 11))))
+        assert book.get_statistics() == scan(book)
+
+    for side in (book.bid_book, book.ask_book):
+        for level in side.values():
+            assert level["size"] == sum(order.quantity for order in level["orders"])
+            assert level["number_orders"] == len(level["orders"])
+    best_buy, best_sell = book.get_quotes()
+    assert best_buy == (max(book.ask_book) if book.ask_book else None)
+    assert best_sell == (min(book.bid_book) if book.bid_book else None)
+
+
+@pytest.mark.parametrize("highest_first", [False, True])
+def test_price_levels_match_sorted_scan(highest_first):
+    rng = np.random.default_rng(1)
+    levels = PriceLevels(highest_first)
+    live = set()
+    for _ in range(5000):
+        price = int(rng.integers(0, 50))
+        if price in live:
+            levels.remove(price)
+            live.remove(price)
+        else:
+            levels.add(price)
+            live.add(price)
+        expected = sorted(live, reverse=highest_first)
+        assert list(levels) == expected
+        if live:
+            assert levels.best() == expected[0]
+        assert levels.top(5) == expected[:5]
+
+
+# seed: (prices, sum of prices, trades, volume, sum of absolute deviations of the pnl from its mean)
+REGRESSION = {
+    0: (1000, 99877.0, 306, 2868, 5812.0),
+    1: (1000, 100511.0, 318, 3033, 8548.0),
+    2: (1000, 99482.0, 401, 4748, 7904.0),
+}
+
+
+def summary(sim_):
+    pnl = sim_.pnl_df["PNL"]
+    return (len(sim_.market_prices), float(np.sum(sim_.market_prices)), len(sim_.tape),
+            int(sim_.tape.column("quantity").sum()), round(float(np.abs(pnl - pnl.mean()).sum()), 6))
+
+
+@pytest.mark.parametrize("seed", sorted(REGRESSION))
+def test_seeded_run(seed):
+    sim = Simulation(20, 40, 10, (100, 3), (6, 2), seed_=seed)
+    sim.start()
+    assert summary(sim) == REGRESSION[seed]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_exact_cohort_matches_traders(seed):
+    traders = Simulation(30, 60, 10, (100, 3), (6, 2), seed_=seed)
+    cohort = Simulation(30, 60, 10, (100, 3), (6, 2), seed_=seed, cohort_="exact")
+    traders.start()
+    cohort.start()
+    assert cohort.market_prices == traders.market_prices
+    assert cohort.pnl_df.sort_values("Trader").reset_index(drop=True).equals(
+        traders.pnl_df.sort_values("Trader").reset_index(drop=True))
+    for name in traders.tape.arrays():
+        assert np.array_equal(cohort.tape.column(name), traders.tape.column(name))
+
+
+@pytest.mark.parametrize("depth", [1, 3, 10])
+def test_depth_history_matches_book(depth, tmp_path):
+    # snapshots of an unchanged top n only compare the levels the order touched
+    recorder = DepthRecorder(str(tmp_path), depth_=depth, keyframe_every_=50)
+    sim = Simulation(10, 40, 10, (100, 3), (6, 2), seed_=0, depth_=recorder)
+    expected = {}
+    submit = sim.submit
+
+    def submit_and_keep(order_):
+        price = submit(order_)
+        if order_ is not None:
+            book = sim.market.orderbook
+            expected[book.next_order_id] = book.get_depth(depth)
+        return price
+
+    sim.submit = submit_and_keep
+    sim.start()
+    recorder.close()
+
+    reader = DepthReader(str(tmp_path))
+    for seq, (buy, sell) in expected.items():
+        recorded = reader[seq]
+        assert recorded.buy.tolist() == buy
+        assert recorded.sell.tolist() == sell